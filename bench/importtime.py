@@ -0,0 +1,105 @@
+"""
+Import-time budget for both simulators.
+
+Each simulator is imported in a fresh `python -X importtime` subprocess inside a
+scratch directory holding a copy of config.json. The check fails, with a
+non-zero exit status, when an import takes longer than the budget, pulls in a
+module that should only load on first use, or writes any file (the database is
+only opened by simulator.startup()):
+
+    python bench/importtime.py
+    python bench/importtime.py --budget-ms 500 --top 15
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMULATORS = {
+    "v01": os.path.join(REPO_ROOT, "EHS_project_02-09-2025_v01.py"),
+    "v02": os.path.join(REPO_ROOT, "EHS_project_02-13-2025_v02.py.py"),
+}
+
+DEFAULT_BUDGET_MS = 1000
+# Loaded on first use (generate_report, prediction, vectorized populate, sweeps), never at import
+DEFERRED_MODULES = ("matplotlib", "faker", "pandas", "sklearn", "numpy", "joblib", "pyarrow")
+
+# Run in the child: load the simulator by path and print how long it took
+IMPORT_SNIPPET = """
+import importlib.util, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("ehs_simulator", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def parse_importtime(stderr):
+    """Returns [(module, self_us, cumulative_us)] from `-X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure(variant):
+    """Imports one simulator in a subprocess; returns (milliseconds, importtime rows, files it created)."""
+    scratch = tempfile.mkdtemp(prefix="ehs_importtime_")
+    try:
+        shutil.copy(os.path.join(REPO_ROOT, "config.json"), scratch)
+        snippet = IMPORT_SNIPPET.format(root=REPO_ROOT, path=SIMULATORS[variant])
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", snippet],
+                                   cwd=scratch, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        created = sorted(set(os.listdir(scratch)) - {"config.json"})
+        return float(completed.stdout.strip().splitlines()[-1]), parse_importtime(completed.stderr), created
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def check(variant, budget_ms, top):
+    """Returns a result dict; `problems` is empty when the import is within budget."""
+    try:
+        elapsed_ms, modules, created = measure(variant)
+    except RuntimeError as e:
+        return {"variant": variant, "problems": [f"import failed: {e}"]}
+    loaded = {name.split(".")[0] for name, _, _ in modules}
+    problems = [f"{name} imported eagerly" for name in DEFERRED_MODULES if name in loaded]
+    problems.extend(f"import created {name}" for name in created)
+    if elapsed_ms > budget_ms:
+        problems.append(f"import took {elapsed_ms:.0f} ms, budget is {budget_ms} ms")
+    slowest = sorted(modules, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "variant": variant,
+        "import_ms": round(elapsed_ms, 1),
+        "budget_ms": budget_ms,
+        "modules": len(modules),
+        "slowest_self_us": [{"module": name, "self_us": self_us} for name, self_us, _ in slowest],
+        "problems": problems,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of both simulators against a budget.")
+    parser.add_argument("--variants", nargs="+", choices=sorted(SIMULATORS), default=sorted(SIMULATORS))
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args()
+
+    results = [check(variant, args.budget_ms, args.top) for variant in args.variants]
+    print(json.dumps(results, indent=2))
+    failed = [result for result in results if result["problems"]]
+    for result in failed:
+        print(f"{result['variant']}: " + "; ".join(result["problems"]), file=sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,213 @@
+"""
+Benchmarks for the simulation hot paths, run against both simulators.
+
+Every case runs in its own subprocess inside a scratch directory (with its own
+config.json and database), so peak RSS is per case and runs do not share state.
+Results are printed (or written with --output) as JSON:
+
+    python bench/run.py --quick
+    python bench/run.py --variants v02 --cases populate_patients --output bench.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, time as dt_time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+SIMULATORS = {
+    "v01": os.path.join(REPO_ROOT, "EHS_project_02-09-2025_v01.py"),
+    "v02": os.path.join(REPO_ROOT, "EHS_project_02-13-2025_v02.py.py"),
+}
+
+# case -> list of (size, staff_scale) to run
+FULL_PLAN = {
+    "populate_departments_and_staff": [(None, 1), (None, 4)],
+    "populate_patients": [(1000, 1), (100000, 1), (1000000, 1)],
+    "simulate_shift": [(1000, 1), (10000, 1), (10000, 4), (100000, 4)],
+    "generate_report": [(10000, 1)],
+    "ml_fit": [(1000, 1), (100000, 1)],
+    "ml_predict": [(10000, 1), (1000000, 1)],
+}
+QUICK_PLAN = {
+    "populate_departments_and_staff": [(None, 1)],
+    "populate_patients": [(1000, 1)],
+    "simulate_shift": [(1000, 1)],
+    "generate_report": [(1000, 1)],
+    "ml_fit": [(1000, 1)],
+    "ml_predict": [(10000, 1)],
+}
+# The model is shared by both simulators, so it is benchmarked once
+SHARED_CASES = ("ml_fit", "ml_predict")
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def scaled_config(staff_scale):
+    """The repo config with every staffing range multiplied by `staff_scale` and a local database."""
+    from hospital_config import load_config
+    config = load_config(os.path.join(REPO_ROOT, "config.json")).as_dict()
+    for dept in config["departments_info"]:
+        for role, value in dept["staffing"].items():
+            dept["staffing"][role] = {"min": value["min"] * staff_scale, "max": value["max"] * staff_scale}
+    config["db_path"] = "bench.db"
+    config["model_path"] = "bench_model.joblib"
+    return config
+
+
+def load_simulator(variant):
+    spec = importlib.util.spec_from_file_location(f"ehs_{variant}", SIMULATORS[variant])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def spread_arrivals_over_day_shift():
+    """Puts every patient inside today's Day shift so simulate_shift sees all of them."""
+    from connection_manager import connection
+    from report_cache import bump_data_version
+    start = int(datetime.combine(datetime.now().date(), dt_time(7, 0)).timestamp())
+    with connection() as conn:
+        conn.execute("UPDATE patients SET arrival_time = ? + (id * 7919) % 43200", (start,))
+        bump_data_version(conn)
+
+
+def count_rows(table):
+    from connection_manager import connection
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def run_case(case, variant, size):
+    """Runs one case in this process; returns (rows processed, seconds, extra fields)."""
+    if case in SHARED_CASES:
+        import numpy as np
+        from ml_model import HospitalMLModel
+        ml = HospitalMLModel()
+        if case == "ml_fit":
+            data = ml.load_data("config.json", size=size)
+            started = time.perf_counter()
+            X, y = ml.prepare_features_labels(data)
+            accuracy = ml.train_model(X, y)
+            return size, time.perf_counter() - started, {"accuracy": accuracy}
+        ml.main("config.json")
+        rng = np.random.default_rng(0)
+        batch = np.column_stack([rng.integers(0, 100, size), rng.integers(1, 10, size)])
+        started = time.perf_counter()
+        ml.predict_departments(batch)
+        return size, time.perf_counter() - started, {}
+
+    module = load_simulator(variant)
+    import simulator
+    simulator.startup()
+    module.create_db()
+    if case == "populate_departments_and_staff":
+        started = time.perf_counter()
+        module.populate_departments_and_staff()
+        elapsed = time.perf_counter() - started
+        return count_rows("staff"), elapsed, {}
+    if case == "populate_patients":
+        started = time.perf_counter()
+        module.populate_patients(size)
+        return size, time.perf_counter() - started, {}
+
+    module.populate_departments_and_staff()
+    module.populate_patients(size)
+    spread_arrivals_over_day_shift()
+    if case == "simulate_shift":
+        started = time.perf_counter()
+        module.simulate_shift("Day", "07:00", "19:00")
+        elapsed = time.perf_counter() - started
+        return size, elapsed, {"staff": count_rows("staff"), "appointments": count_rows("appointments")}
+    if case == "generate_report":
+        module.simulate_shift("Day", "07:00", "19:00")
+        started = time.perf_counter()
+        module.generate_report()
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        module.generate_report()
+        warm = time.perf_counter() - started
+        return count_rows("appointments"), cold, {"cached_seconds": warm}
+    raise ValueError(f"Unknown case: {case}")
+
+
+def worker(case, variant, size):
+    result = {"case": case, "variant": variant, "size": size}
+    try:
+        rows, seconds, extra = run_case(case, variant, size)
+        result.update(rows=rows, seconds=seconds, rows_per_sec=rows / seconds if seconds > 0 else None, **extra)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_in_subprocess(case, variant, size, staff_scale):
+    scratch = tempfile.mkdtemp(prefix="ehs_bench_")
+    try:
+        with open(os.path.join(scratch, "config.json"), "w") as f:
+            json.dump(scaled_config(staff_scale), f)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", case, variant, str(size)]
+        completed = subprocess.run(command, cwd=scratch, capture_output=True, text=True)
+        lines = completed.stdout.strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            result = {"case": case, "variant": variant, "size": size,
+                      "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no output"}
+        result["staff_scale"] = staff_scale
+        return result
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_plan(plan, variants):
+    results = []
+    for case, runs in plan.items():
+        for variant in (("shared",) if case in SHARED_CASES else variants):
+            for size, staff_scale in runs:
+                result = run_in_subprocess(case, variant, size, staff_scale)
+                status = result.get("error") or f"{result.get('rows_per_sec') or 0:.0f} rows/sec"
+                print(f"{case} [{variant}] size={size} staff_scale={staff_scale}: {status}", file=sys.stderr)
+                results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--worker":
+        _, _, case_name, variant_name, size_arg = sys.argv
+        print(json.dumps(worker(case_name, variant_name, None if size_arg == "None" else int(size_arg))))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths for v01 and v02.")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--variants", nargs="+", choices=sorted(SIMULATORS), default=sorted(SIMULATORS))
+    parser.add_argument("--cases", nargs="+", choices=sorted(FULL_PLAN), default=None)
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    chosen = QUICK_PLAN if args.quick else FULL_PLAN
+    if args.cases:
+        chosen = {case: runs for case, runs in chosen.items() if case in args.cases}
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "results": run_plan(chosen, args.variants),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from metrics import inc, timer
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def chunked(rows, size):
+    """Yields lists of at most `size` rows from any iterable."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def bulk_load_pragmas(conn):
+    """
+    Tunes SQLite for a bulk load: WAL journaling and synchronous=OFF.
+    The previous synchronous level is restored on exit; WAL is left on because
+    it is a persistent property of the database file.
+    """
+    previous_synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+        conn.execute(f"PRAGMA synchronous={int(previous_synchronous)}")
+
+
+def bulk_insert(conn, sql, rows, batch_size=DEFAULT_BATCH_SIZE, collect_rowids=False):
+    """
+    Inserts `rows` with executemany, committing one transaction per chunk of
+    `batch_size` rows. Rows may be a generator so they are never all held in memory.
+
+    Returns the number of rows inserted, or the list of their rowids when
+    `collect_rowids` is set (rowids of a single executemany into an
+    AUTOINCREMENT table are contiguous, so they are derived from last_insert_rowid()).
+    """
+    total = 0
+    rowids = [] if collect_rowids else None
+    for chunk in chunked(rows, batch_size):
+        with timer("db_batch_insert"), conn:
+            conn.executemany(sql, chunk)
+            if collect_rowids:
+                last_rowid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                rowids.extend(range(last_rowid - len(chunk) + 1, last_rowid + 1))
+        inc("db_rows_inserted", len(chunk))
+        total += len(chunk)
+    return rowids if collect_rowids else total
+
+
+def report_throughput(label, num_rows, started):
+    """Prints and returns the rows/sec achieved since `started` (a time.perf_counter() value)."""
+    elapsed = time.perf_counter() - started
+    rows_per_sec = num_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{label}: {num_rows} rows in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    return rows_per_sec
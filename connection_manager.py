@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from metrics import inc
+
+DEFAULT_DB_PATH = 'hospital_simulation.db'
+DEFAULT_POOL_SIZE = 4
+
+# Applied to every new connection, in order.
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -64 * 1024),  # negative = KiB, i.e. 64 MiB of page cache
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 30000),  # ms; concurrent jobs wait for the write lock instead of failing
+)
+
+
+class ConnectionManager:
+    """
+    Hands out SQLite connections from one pool shared by every thread.
+
+    Connections are opened once with the pragmas applied and kept open between
+    calls, so requests reuse a warm page cache instead of paying connect +
+    cold-cache cost every time. Threaded servers start a thread per request, so
+    the pool is not per thread: a borrowed connection goes back to the shared
+    pool, at most `pool_size` idle connections are kept, and any extra
+    connection opened under load is closed when it is returned. Borrowing never
+    blocks, so nested borrows on one thread cannot deadlock.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool_size=DEFAULT_POOL_SIZE, pragmas=DEFAULT_PRAGMAS):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.pragmas = tuple(pragmas)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._all_connections = []
+
+    def _connect(self):
+        # check_same_thread=False because a pooled connection is borrowed by
+        # whichever thread asks next; it is only ever used by one borrower at a time.
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        inc("db_connections_opened")
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        # Warm the schema cache so the first real query does not pay for it.
+        conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        with self._lock:
+            self._all_connections.append(conn)
+        return conn
+
+    def warm(self, count=None):
+        """Pre-opens connections until `count` (default: pool_size) are idle in the pool."""
+        target = min(count or self.pool_size, self.pool_size)
+        while True:
+            with self._lock:
+                if len(self._idle) >= target:
+                    return
+            conn = self._connect()
+            self._return(conn)
+
+    def _borrow(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _return(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of the block.
+        The transaction is committed on success and rolled back on error.
+        """
+        conn = self._borrow()
+        inc("db_connections_borrowed")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._return(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._all_connections:
+                self._all_connections.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        """Closes every connection opened by this manager, on any thread."""
+        with self._lock:
+            connections, self._all_connections = self._all_connections, []
+            self._idle = []
+        for conn in connections:
+            conn.close()
+
+
+_manager = ConnectionManager()
+
+
+def configure(db_path=DEFAULT_DB_PATH, pool_size=DEFAULT_POOL_SIZE, pragmas=DEFAULT_PRAGMAS):
+    """
+    Replaces the shared manager, e.g. to point at a different database file,
+    and pre-opens its pool so the first requests find warm connections.
+    """
+    global _manager
+    previous = _manager
+    _manager = ConnectionManager(db_path, pool_size, pragmas)
+    previous.close_all()
+    _manager.warm()
+    return _manager
+
+
+def get_manager():
+    return _manager
+
+
+def connection():
+    """Borrows a connection from the shared manager: `with connection() as conn: ...`"""
+    return _manager.connection()
@@ -0,0 +1,115 @@
+import heapq
+from array import array
+
+
+class IndexedDispatcher:
+    """
+    Priority queue of clinicians keyed by their next available time, for
+    clinicians identified by dense integer indexes (see entity_store.StaffStore).
+
+    Replaces re-sorting every staff member for each patient: peek() is O(1)
+    (amortised) and update() is O(log S). Ties on the available time are
+    broken by the order the staff were given in, which matches the stable
+    sort the scheduler used previously, so assignments are unchanged for a
+    given seed.
+
+    State lives in typed array columns indexed by the clinician rather than
+    dicts, and each heap entry is a single int packing the available time
+    (non-negative integer epoch seconds) above the clinician's tie-break order,
+    instead of a 4-tuple. An entry is stale unless it equals the clinician's
+    current key, so no version numbers are needed.
+    """
+
+    ORDER_BITS = 32
+
+    def __init__(self, staff_indexes, start_time):
+        self._next_available = array('q')
+        self._order = array('q')
+        self._present = bytearray()
+        self._by_order = array('q')  # tie-break order -> index; orders go to clinicians as first pushed
+        self._count = 0
+        self._heap = []
+        for index in staff_indexes:
+            self.push(index, start_time)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, index):
+        return index < len(self._present) and self._present[index] == 1
+
+    def _key(self, index):
+        return (self._next_available[index] << self.ORDER_BITS) | self._order[index]
+
+    def _grow(self, size):
+        missing = size - len(self._present)
+        self._next_available.extend(array('q', [0]) * missing)
+        self._order.extend(array('q', [-1]) * missing)
+        self._present.extend(bytes(missing))
+
+    def _discard_stale(self):
+        heap = self._heap
+        mask = (1 << self.ORDER_BITS) - 1
+        while heap:
+            index = self._by_order[heap[0] & mask]
+            if self._present[index] and heap[0] == self._key(index):
+                return index
+            heapq.heappop(heap)
+        return None
+
+    def peek(self):
+        """Returns (index, available_time) of the earliest free clinician, or None."""
+        index = self._discard_stale()
+        if index is None:
+            return None
+        return index, self._next_available[index]
+
+    def pop(self):
+        """Removes and returns (index, available_time) of the earliest free clinician."""
+        entry = self.peek()
+        if entry is None:
+            raise IndexError("pop from an empty dispatcher")
+        heapq.heappop(self._heap)
+        self._present[entry[0]] = 0
+        self._count -= 1
+        return entry
+
+    def push(self, index, available_time):
+        """Adds a clinician (or re-adds one previously popped)."""
+        if index >= len(self._present):
+            self._grow(index + 1)
+        elif self._present[index]:
+            self.update(index, available_time)
+            return
+        if self._order[index] < 0:
+            self._order[index] = len(self._by_order)
+            self._by_order.append(index)
+        self._next_available[index] = available_time
+        self._present[index] = 1
+        self._count += 1
+        heapq.heappush(self._heap, self._key(index))
+
+    def update(self, index, available_time):
+        """Sets a clinician's next available time."""
+        top = self._heap[0] if self._heap else None
+        replaces_top = top is not None and top == self._key(index)
+        self._next_available[index] = available_time
+        key = self._key(index)
+        if replaces_top:
+            # The common case: the clinician just assigned is at the top.
+            if key != top:
+                heapq.heapreplace(self._heap, key)
+        else:
+            heapq.heappush(self._heap, key)
+
+    def remove(self, index):
+        """Removes a clinician wherever they are in the queue."""
+        if index not in self:
+            raise KeyError(index)
+        self._present[index] = 0
+        self._count -= 1
+
+    def next_available(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self._next_available[index]
@@ -0,0 +1,94 @@
+from array import array
+
+
+class StaffStore:
+    """
+    Clinicians as dense integer indexes 0..n-1 over typed array columns.
+
+    The scheduler refers to a clinician by index only: department, shift and
+    the on-duty / busy flags are array or bytearray columns (about 11 bytes per
+    clinician), and the string staff id is looked up in `ids` only when an
+    appointment is written.
+    """
+
+    def __init__(self, staff=()):
+        self.ids = []
+        self.department = array('q')
+        self.shift = array('h')  # index into self.shifts
+        self.shifts = []
+        self._shift_index = {}
+        self.on_duty = bytearray()
+        self.busy = bytearray()
+        for row in staff:
+            self.add(*row)
+
+    def add(self, staff_id, department_id, shift=None):
+        """Adds a clinician and returns their index."""
+        shift_index = self._shift_index.get(shift)
+        if shift_index is None:
+            shift_index = self._shift_index[shift] = len(self.shifts)
+            self.shifts.append(shift)
+        index = len(self.ids)
+        self.ids.append(staff_id)
+        self.department.append(department_id)
+        self.shift.append(shift_index)
+        self.on_duty.append(0)
+        self.busy.append(0)
+        return index
+
+    def by_shift(self):
+        """Returns {shift: array of clinician indexes}, in the order they were added."""
+        groups = {shift: array('l') for shift in self.shifts}
+        shifts = self.shifts
+        for index, shift_index in enumerate(self.shift):
+            groups[shifts[shift_index]].append(index)
+        return groups
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class PatientStore:
+    """
+    Waiting patients as slots in typed array columns (17 bytes each) instead of
+    one tuple per patient. A slot is freed once the patient is seen and reused
+    by the next arrival, so the store only grows with the longest queue.
+    Arrival times are int64 epoch seconds, as everywhere in the engine.
+    """
+
+    def __init__(self):
+        self.patient_id = array('q')
+        self.triage = array('b')
+        self.arrival = array('q')
+        self._free = array('l')
+
+    def add(self, patient_id, triage_level, arrival):
+        """Stores a patient and returns their slot."""
+        if self._free:
+            slot = self._free.pop()
+            self.patient_id[slot] = patient_id
+            self.triage[slot] = triage_level
+            self.arrival[slot] = arrival
+            return slot
+        self.patient_id.append(patient_id)
+        self.triage.append(triage_level)
+        self.arrival.append(arrival)
+        return len(self.patient_id) - 1
+
+    def release(self, slot):
+        """Frees a slot and returns the patient it held as (patient_id, triage_level, arrival)."""
+        self._free.append(slot)
+        return self.patient_id[slot], self.triage[slot], self.arrival[slot]
+
+    def __len__(self):
+        """Number of patients currently stored."""
+        return len(self.patient_id) - len(self._free)
+
+    def triage_counts(self):
+        """Returns {triage_level: patients currently stored}."""
+        free = set(self._free)
+        counts = {}
+        for slot, triage in enumerate(self.triage):
+            if slot not in free:
+                counts[triage] = counts.get(triage, 0) + 1
+        return counts
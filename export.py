@@ -0,0 +1,195 @@
+import csv
+import importlib.util
+import io
+import json
+from datetime import datetime
+
+from connection_manager import connection
+from metrics import inc
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# table -> (columns, FROM clause, {filter: column it applies to})
+EXPORTS = {
+    "appointments": (
+        ("id", "patient_id", "staff_id", "department_id", "scheduled_time", "duration", "status", "wait_minutes"),
+        "appointments a",
+        {"shift": "s.shift", "department": "a.department_id", "time": "a.scheduled_time"},
+    ),
+    "patients": (
+        ("id", "name", "dob", "gender", "triage_level", "arrival_time"),
+        "patients a",
+        {"time": "a.arrival_time"},
+    ),
+    "staff": (
+        ("id", "name", "role", "department_id", "availability", "shift"),
+        "staff a",
+        {"shift": "a.shift", "department": "a.department_id"},
+    ),
+}
+
+# Arrow type of each exported column (in EXPORTS order), so arrow and parquet
+# exports carry a schema even when no rows match
+ARROW_TYPES = {
+    "appointments": ("int64", "int64", "string", "int64", "string", "int64", "string", "float64"),
+    "patients": ("int64", "string", "string", "string", "int64", "int64"),
+    "staff": ("string", "string", "string", "int64", "string", "string"),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _time_value(column, value):
+    """Window bounds are ISO datetimes; patients store epoch seconds, appointments datetime text."""
+    moment = datetime.fromisoformat(value)
+    if column == "a.arrival_time":
+        return int(moment.timestamp())
+    return str(moment)
+
+
+def build_query(table, shift=None, department=None, start=None, end=None):
+    """
+    Returns (columns, sql, params) for exporting `table` with optional filters:
+    shift name, department id or name, and an ISO [start, end] time window.
+    Raises ValueError for unknown tables or filters the table does not support.
+    """
+    if table not in EXPORTS:
+        raise ValueError(f"Unknown export table: {table}")
+    columns, source, filterable = EXPORTS[table]
+    where, params = [], []
+    if shift is not None:
+        if "shift" not in filterable:
+            raise ValueError(f"{table} cannot be filtered by shift")
+        if table == "appointments":
+            source += " JOIN staff s ON s.id = a.staff_id"
+        where.append(f"{filterable['shift']} = ?")
+        params.append(shift)
+    if department is not None:
+        if "department" not in filterable:
+            raise ValueError(f"{table} cannot be filtered by department")
+        if str(department).isdigit():
+            where.append(f"{filterable['department']} = ?")
+            params.append(int(department))
+        else:
+            where.append(f"{filterable['department']} = (SELECT id FROM departments WHERE name = ?)")
+            params.append(department)
+    for bound, operator in ((start, ">="), (end, "<=")):
+        if bound is not None:
+            if "time" not in filterable:
+                raise ValueError(f"{table} cannot be filtered by time")
+            where.append(f"{filterable['time']} {operator} ?")
+            params.append(_time_value(filterable["time"], bound))
+    sql = f"SELECT {', '.join('a.' + column for column in columns)} FROM {source}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return columns, sql + " ORDER BY a.rowid", params
+
+
+def iter_chunks(conn, sql, params, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields lists of rows from a cursor with fetchmany, so only one chunk is in memory."""
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        inc("export_rows", len(rows))
+        yield rows
+
+
+def ndjson_chunks(columns, chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+
+def csv_chunks(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header alone, when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain, keeping the true offset."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def arrow_chunks(columns, types, chunks, fmt="arrow"):
+    """
+    Arrow IPC stream or Parquet (one row group per chunk); needs pyarrow. `types`
+    are the columns' pyarrow type names. The schema is written before any rows,
+    so a query with no matches still gives a valid, empty stream or file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(column, getattr(pa, type_name)()) for column, type_name in zip(columns, types)])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for rows in chunks:
+        batch = pa.RecordBatch.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema)
+        if fmt == "parquet":
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(table, fmt="ndjson", chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """
+    Validates the request and returns (mimetype, generator of str/bytes chunks).
+    The generator holds one pooled connection while it is consumed and reads
+    `chunk_size` rows at a time, so memory stays flat however many rows match.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    columns, sql, params = build_query(table, **filters)
+    if fmt in ("arrow", "parquet") and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError(f"format {fmt} needs pyarrow, which is not installed")
+
+    def generate():
+        with connection() as conn:
+            chunks = iter_chunks(conn, sql, params, chunk_size)
+            if fmt == "ndjson":
+                yield from ndjson_chunks(columns, chunks)
+            elif fmt == "csv":
+                yield from csv_chunks(columns, chunks)
+            else:
+                yield from arrow_chunks(columns, ARROW_TYPES[table], chunks, fmt)
+
+    return FORMATS[fmt], generate()
@@ -0,0 +1,261 @@
+"""
+Loads, validates and caches the simulator configuration.
+
+Staffing ranges are accepted in every format the repo has used:
+
+    "staffing": {"Doctor": {"min": 4, "max": 6}}             (config.json)
+    "staffing": {"Doctor": [4, 6]}                           (config_extended.json)
+    "staffing": [{"name": "Doctor", "min": 4, "max": 6}]
+
+and compiled once into frozen, slotted dataclasses. load_config() caches the
+result per file and only re-reads a file whose mtime or size has changed, so
+calling it on every request is how a running process picks up edits.
+"""
+import copy
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+
+DEFAULT_CONFIG_PATH = 'config.json'
+DEFAULT_MODEL_PATH = 'hospital_model.joblib'
+
+DEFAULTS = {
+    "num_patients": 200,
+    "cancellation_rate": 0.1,
+    "shifts": ["Day", "Night"],
+    "shift_times": {"Day": {"start": "07:00", "end": "19:00"}, "Night": {"start": "19:00", "end": "07:00"}},
+}
+
+# Settings that take one of a fixed set of values; the first is the default
+CHOICES = {
+    "scheduling_policy": ("fifo", "triage"),
+    "matching": ("global", "department"),
+    "simulation_mode": ("stream", "buffered", "memory"),
+    "patient_generator": ("faker", "vectorized"),
+    "model_source": ("synthetic", "database"),
+    "model_estimator": ("forest", "shallow_forest", "hist_gb"),
+    "model_encoding": ("onehot", "numeric"),
+}
+
+
+class ConfigError(ValueError):
+    """The configuration file is malformed; the message names the offending key."""
+
+
+@dataclass(frozen=True, slots=True)
+class RoleStaffing:
+    role: str
+    min: int
+    max: int
+
+
+@dataclass(frozen=True, slots=True)
+class Department:
+    name: str
+    capacity: int
+    is_clinical: bool
+    staffing: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class ShiftTime:
+    start: str
+    end: str
+
+
+@dataclass(frozen=True, slots=True)
+class HospitalConfig:
+    path: str
+    version: tuple  # (mtime_ns, size) of the file it was read from
+    departments: tuple
+    num_patients: int
+    cancellation_rate: float
+    shifts: tuple
+    shift_times: MappingProxyType
+    _settings: MappingProxyType
+
+    def get(self, key, default=None):
+        """
+        Any top-level setting, in plain JSON types, with departments_info in the
+        canonical {"min": .., "max": ..} staffing format. Returns a copy.
+        """
+        return copy.deepcopy(self._settings.get(key, default))
+
+    def as_dict(self):
+        """All settings as a plain dict (a copy), e.g. to write a modified config back out."""
+        return copy.deepcopy(dict(self._settings))
+
+    def __getitem__(self, key):
+        if key not in self._settings:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key):
+        return key in self._settings
+
+
+def _fail(where, message):
+    raise ConfigError(f"{where}: {message}")
+
+
+def _count(where, value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        _fail(where, f"expected a non-negative integer, got {value!r}")
+    return value
+
+
+def _positive(where, value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        _fail(where, f"expected a positive integer, got {value!r}")
+    return value
+
+
+def _choices(settings):
+    for key, choices in CHOICES.items():
+        if key in settings and settings[key] not in choices:
+            _fail(key, f"expected one of {', '.join(map(repr, choices))}, got {settings[key]!r}")
+    # The synthetic model's one-hot features are not categorical codes hist_gb can use;
+    # the database model is always trained with numeric features
+    if (settings.get("model_estimator") == "hist_gb" and settings.get("model_encoding", "onehot") == "onehot"
+            and settings.get("model_source", "synthetic") == "synthetic"):
+        _fail("model_encoding", "model_estimator 'hist_gb' needs model_encoding 'numeric'")
+
+
+def _role_staffing(where, role, value):
+    if isinstance(value, dict):
+        if "min" not in value or "max" not in value:
+            _fail(where, "expected keys 'min' and 'max'")
+        low, high = value["min"], value["max"]
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        low, high = value
+    else:
+        _fail(where, f"expected {{'min': n, 'max': m}} or [n, m], got {value!r}")
+    low, high = _count(f"{where}.min", low), _count(f"{where}.max", high)
+    if low > high:
+        _fail(where, f"min {low} is greater than max {high}")
+    return RoleStaffing(role, low, high)
+
+
+def _staffing(where, staffing):
+    if isinstance(staffing, dict):
+        return tuple(_role_staffing(f"{where}.{role}", role, value) for role, value in staffing.items())
+    if isinstance(staffing, list):
+        roles = []
+        for i, entry in enumerate(staffing):
+            if not isinstance(entry, dict) or "name" not in entry:
+                _fail(f"{where}[{i}]", "expected {'name': role, 'min': n, 'max': m}")
+            roles.append(_role_staffing(f"{where}[{i}]", entry["name"], entry))
+        return tuple(roles)
+    _fail(where, f"expected a mapping or list of roles, got {type(staffing).__name__}")
+
+
+def _departments(raw):
+    if not isinstance(raw, list):
+        _fail("departments_info", "expected a list")
+    departments, seen = [], set()
+    for i, dept in enumerate(raw):
+        where = f"departments_info[{i}]"
+        if not isinstance(dept, dict) or not isinstance(dept.get("name"), str):
+            _fail(where, "expected an object with a 'name'")
+        if dept["name"] in seen:
+            _fail(where, f"duplicate department {dept['name']!r}")
+        seen.add(dept["name"])
+        staffing = _staffing(f"{where}.staffing", dept.get("staffing", {}))
+        departments.append(Department(dept["name"], _count(f"{where}.capacity", dept.get("capacity", 0)),
+                                      bool(dept.get("is_clinical", False)), staffing))
+    return tuple(departments)
+
+
+def _shift_times(shifts, raw):
+    if not isinstance(raw, dict):
+        _fail("shift_times", "expected a mapping of shift -> {'start', 'end'}")
+    times = {}
+    for shift, value in raw.items():
+        where = f"shift_times.{shift}"
+        if not isinstance(value, dict) or "start" not in value or "end" not in value:
+            _fail(where, "expected keys 'start' and 'end'")
+        for key in ("start", "end"):
+            try:
+                datetime.strptime(value[key], "%H:%M")
+            except (TypeError, ValueError):
+                _fail(f"{where}.{key}", f"expected HH:MM, got {value[key]!r}")
+        times[shift] = ShiftTime(value["start"], value["end"])
+    for shift in shifts:
+        if shift not in times:
+            _fail("shifts", f"shift {shift!r} has no entry in shift_times")
+    return MappingProxyType(times)
+
+
+def compile_config(raw, path="<memory>", version=None):
+    """Validates a parsed config and compiles it into a HospitalConfig."""
+    if not isinstance(raw, dict):
+        raise ConfigError("top level: expected an object")
+    settings = dict(DEFAULTS, **raw)
+    departments = _departments(settings.get("departments_info", []))
+    shifts = settings["shifts"]
+    if not isinstance(shifts, list) or not all(isinstance(shift, str) for shift in shifts):
+        _fail("shifts", "expected a list of shift names")
+    rate = settings["cancellation_rate"]
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+        _fail("cancellation_rate", f"expected a number between 0 and 1, got {rate!r}")
+    _choices(settings)
+    for key in ("batch_size", "job_workers"):
+        if key in settings:
+            _positive(key, settings[key])
+
+    # Canonical staffing format for code that reads the plain settings
+    settings["departments_info"] = [
+        dict(raw_dept, staffing={s.role: {"min": s.min, "max": s.max} for s in dept.staffing})
+        for raw_dept, dept in zip(settings.get("departments_info", []), departments)
+    ]
+    return HospitalConfig(
+        path=path,
+        version=version,
+        departments=departments,
+        num_patients=_count("num_patients", settings["num_patients"]),
+        cancellation_rate=float(rate),
+        shifts=tuple(shifts),
+        shift_times=_shift_times(shifts, settings["shift_times"]),
+        _settings=MappingProxyType(settings),
+    )
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    """
+    Returns the compiled config for `path`. The file is re-read only when its
+    mtime or size has changed since the last call; otherwise the cached object
+    (the same instance) is returned. A file that fails validation raises
+    ConfigError and the previous config stays cached.
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(key)
+    if cached is not None and cached.version == version:
+        return cached
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached.version == version:
+            return cached
+        with open(key, 'r') as f:
+            try:
+                raw = json.load(f)
+            except ValueError as e:
+                raise ConfigError(f"{path}: not valid JSON ({e})")
+        compiled = _cache[key] = compile_config(raw, path, version)
+        return compiled
+
+
+if __name__ == "__main__":
+    import sys
+    for config_path in sys.argv[1:] or [DEFAULT_CONFIG_PATH]:
+        loaded = load_config(config_path)
+        print(f"{config_path}: OK, {len(loaded.departments)} departments, "
+              f"{sum(s.max for d in loaded.departments for s in d.staffing)} staff at most")
@@ -0,0 +1,121 @@
+import threading
+
+from connection_manager import connection
+from metrics import inc
+
+DEFAULT_BLOCK_SIZE = 100
+FALLBACK_PREFIX = "ST"
+
+# Prefixes for the configured roles. Each prefix is also its own sequence, so
+# two roles that share one (e.g. derived prefixes of unknown roles) still get
+# distinct IDs.
+STAFF_ID_PREFIXES = {
+    "Doctor": "MD",
+    "Registered Nurse": "RN",
+    "Nursing Assistant": "NA",
+    "Respiratory Therapist": "RT",
+    "Radiology Technician": "RDT",
+    "Administrative Staff": "AD",
+    "Receptionist": "RC",
+    "Human Resources": "HR",
+    "Cleaner": "CL",
+    "Cook": "CK",
+    "Kitchen Assistant": "KA",
+    "Maintenance Technician": "MT",
+    "Pharmacist": "PH",
+    "Pharmacy Technician": "PT",
+    "Lab Technician": "LT",
+    "IT Support": "IT",
+    "Security Personnel": "SC",
+    "Ophthalmic Technician": "OT",
+    "Physical Therapist": "PHT",
+}
+
+
+def staff_id_prefix(role):
+    """The role's fixed prefix, or for other roles the initials of its words (the first two letters of one word)."""
+    prefix = STAFF_ID_PREFIXES.get(role)
+    if prefix is not None:
+        return prefix
+    words = ["".join(c for c in word if c.isalpha()) for word in role.upper().split()]
+    words = [word for word in words if word]
+    if len(words) > 1:
+        return "".join(word[0] for word in words)
+    return words[0][:2] if words else FALLBACK_PREFIX
+
+
+def format_staff_id(prefix, number):
+    """{PREFIX}700{number}, e.g. MD7001 for the first Doctor."""
+    return f"{prefix}700{number}"
+
+
+def reserve(conn, name, count, initial=None):
+    """
+    Atomically claims `count` consecutive values of sequence `name` in the
+    id_sequences table and returns them as a range. The read and the update run
+    in one IMMEDIATE transaction, so concurrent threads and processes never get
+    overlapping values. A sequence that does not exist yet starts at
+    initial(conn) (default 1), evaluated inside the same transaction.
+    """
+    if count <= 0:
+        return range(0)
+    with conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT next_value FROM id_sequences WHERE name = ?", (name,)).fetchone()
+        first = row[0] if row else (initial(conn) if initial else 1)
+        conn.execute("INSERT OR REPLACE INTO id_sequences (name, next_value) VALUES (?, ?)", (name, first + count))
+    inc("ids_reserved", count, sequence=name)
+    return range(first, first + count)
+
+
+def _after_existing_staff(prefix):
+    """Start a new staff sequence after any IDs with its prefix already in the staff table."""
+    def initial(conn):
+        numbers = [
+            int(staff_id[len(prefix) + 3:])
+            for (staff_id,) in conn.execute("SELECT id FROM staff WHERE id GLOB ?", (f"{prefix}700*",))
+            if staff_id[len(prefix) + 3:].isdigit()
+        ]
+        return max(numbers, default=0) + 1
+    return initial
+
+
+class StaffIdAllocator:
+    """
+    Unique staff IDs ({PREFIX}700{n}) from one sequence per prefix in the
+    id_sequences table, which is the only source of truth: IDs stay unique
+    across threads, processes and restarts, and a second /populate continues
+    where the first stopped instead of reusing IDs.
+
+    reserve_ids(role, count) claims a whole run in one transaction, which is how
+    bulk loaders should ask. next_id(role) serves single IDs from blocks of
+    `block_size` claimed at a time, so callers do not contend on the table per
+    row; IDs left in a block when the process exits are skipped, never reused.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}  # prefix -> [next number, end]
+        self._lock = threading.Lock()
+
+    def _reserve(self, prefix, count):
+        with connection() as conn:
+            return reserve(conn, f"staff:{prefix}", count, _after_existing_staff(prefix))
+
+    def reserve_ids(self, role, count):
+        """Returns `count` new IDs for `role`."""
+        prefix = staff_id_prefix(role)
+        return [format_staff_id(prefix, number) for number in self._reserve(prefix, count)]
+
+    def next_id(self, role):
+        """Returns one new ID for `role`."""
+        prefix = staff_id_prefix(role)
+        with self._lock:
+            block = self._blocks.get(prefix)
+            if block is None or block[0] >= block[1]:
+                numbers = self._reserve(prefix, self.block_size)
+                block = self._blocks[prefix] = [numbers.start, numbers.stop]
+            number = block[0]
+            block[0] += 1
+        return format_staff_id(prefix, number)
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from connection_manager import connection
+from metrics import inc, observe
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+JOB_COLUMNS = ("id", "kind", "status", "progress", "params", "result", "error", "created_at", "started_at",
+               "finished_at", "owner_pid")
+
+
+def _owner_alive(pid):
+    """
+    Whether the process that claimed a job still exists. recover() runs at
+    startup, so a job claimed under our own pid belongs to an earlier process
+    that had the same pid (e.g. pid 1 in a restarted container).
+    """
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _job_dict(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    Runs long requests (simulations, populates) in the background.
+
+    Jobs are rows in the `jobs` table, so their status, progress and results are
+    visible to every worker process and survive restarts; they are executed on a
+    local thread pool. Several processes may share one database: a job is claimed
+    atomically by whichever process starts it first, and the claiming process
+    id is stored so recover() only fails jobs whose owner has exited.
+    `handlers` maps a job kind to handler(params, report_progress), where
+    report_progress(fraction) records progress between 0 and 1, and whose
+    JSON-serializable return value becomes the job's result.
+    """
+
+    def __init__(self, handlers, max_workers=2):
+        self.handlers = handlers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, kind, params=None):
+        """Queues a job and returns its id immediately."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        with connection() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, status, progress, params, created_at) VALUES (?, ?, 0, ?, ?)",
+                (kind, QUEUED, json.dumps(params), time.time())
+            ).lastrowid
+        inc("jobs_submitted", kind=kind)
+        self._executor.submit(self._run, job_id, kind, params)
+        return job_id
+
+    def get(self, job_id):
+        with connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def list(self, limit=50):
+        with connection() as conn:
+            rows = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?",
+                                (limit,)).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def recover(self):
+        """
+        Call once at startup: running jobs whose owner process has exited are
+        marked failed, and jobs still queued are resubmitted. Sibling processes
+        may resubmit the same queued jobs; only the first to claim one runs it.
+        """
+        with connection() as conn:
+            running = conn.execute("SELECT id, owner_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            orphaned = [(job_id,) for job_id, owner_pid in running if not _owner_alive(owner_pid)]
+            conn.executemany("UPDATE jobs SET status = ?, error = 'interrupted by restart', finished_at = ? "
+                             "WHERE id = ? AND status = ?",
+                             [(FAILED, time.time(), job_id, RUNNING) for job_id, in orphaned])
+            queued = conn.execute("SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY id",
+                                  (QUEUED,)).fetchall()
+        for job_id, kind, params in queued:
+            if kind in self.handlers:
+                self._executor.submit(self._run, job_id, kind, json.loads(params or "{}"))
+        return len(queued)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim(self, job_id, started):
+        """Moves a queued job to running for this process; False if another process got it first."""
+        with connection() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner_pid = ? WHERE id = ? AND status = ?",
+                (RUNNING, started, os.getpid(), job_id, QUEUED)
+            ).rowcount
+        return claimed == 1
+
+    def _run(self, job_id, kind, params):
+        started = time.time()
+        if not self._claim(job_id, started):
+            return
+
+        def report_progress(fraction):
+            self._update(job_id, progress=max(0.0, min(1.0, float(fraction))))
+
+        try:
+            result = self.handlers[kind](params, report_progress)
+            self._update(job_id, status=SUCCEEDED, progress=1.0, result=json.dumps(result), finished_at=time.time())
+            inc("jobs_finished", kind=kind, status=SUCCEEDED)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+            inc("jobs_finished", kind=kind, status=FAILED)
+        observe("job_run", time.time() - started, kind=kind)
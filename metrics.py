@@ -0,0 +1,140 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# (name, sorted label items) -> value; timers keep [count, total seconds]
+_counters = {}
+_timers = {}
+_lock = threading.Lock()
+
+PROFILE_TOP = 25
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, amount=1, **labels):
+    """Adds `amount` to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    """Records one timing of `seconds`."""
+    key = _key(name, labels)
+    with _lock:
+        timing = _timers.get(key)
+        if timing is None:
+            _timers[key] = [1, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    """Times the block; exceptions are timed too and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(prefix="ehs_"):
+    """All counters and timers in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        timers = sorted((key, tuple(value)) for key, value in _timers.items())
+    lines = []
+    declared = set()
+    for (name, labels), value in counters:
+        metric = f"{prefix}{name}_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (name, labels), (count, total) in timers:
+        metric = f"{prefix}{name}_seconds"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} summary")
+        lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def profile_stats(profiler, top=PROFILE_TOP):
+    """The `top` functions by cumulative time, as pstats text."""
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def install_flask_hooks(app):
+    """
+    Adds GET /metrics, per-endpoint request counts and latencies, and opt-in
+    profiling: any request with ?profile=1 runs under cProfile and returns the
+    top hotspots as text instead of its normal response.
+    """
+    # Imported here so the rest of this module works without Flask
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        g.metrics_started = time.perf_counter()
+        if request.args.get("profile") == "1":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _finish_request(response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            response = app.response_class(profile_stats(profiler), mimetype="text/plain")
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unknown"
+            observe("http_request", time.perf_counter() - started, endpoint=endpoint)
+            inc("http_requests", endpoint=endpoint, status=response.status_code)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def api_metrics():
+        return app.response_class(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml_model import HospitalMLModel
+
+# (estimator, encoding) pairs; the first is the original configuration
+CONFIGURATIONS = (
+    ("forest", "onehot"),
+    ("forest", "numeric"),
+    ("shallow_forest", "numeric"),
+    ("hist_gb", "numeric"),
+)
+
+
+def benchmark_configuration(estimator, encoding, data, predict_rows=10000, seed=0):
+    """
+    Fits one configuration on `data` and measures fit time, prediction latency for
+    `predict_rows` random patients, artifact size and held-out accuracy.
+    """
+    ml = HospitalMLModel(estimator=estimator, encoding=encoding)
+    started = time.perf_counter()
+    X, y = ml.prepare_features_labels(data)
+    accuracy = ml.train_model(X, y)
+    fit_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed)
+    batch = np.column_stack([rng.integers(0, 100, predict_rows), rng.integers(1, 10, predict_rows)])
+    # Raw estimator cost: every row goes through the encoder and the model
+    started = time.perf_counter()
+    rows = batch if ml.encoder is None else ml.encoder.transform(pd.DataFrame(batch, columns=ml.feature_columns))
+    ml.model.predict(rows)
+    raw_predict_ms = (time.perf_counter() - started) * 1000
+    # Batch API: distinct (age, symptom_code) pairs are predicted once
+    started = time.perf_counter()
+    ml.predict_departments(batch)
+    batch_predict_ms = (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = ml.save(os.path.join(tmp, "model.joblib"))
+        size_bytes = os.path.getsize(path)
+
+    return {
+        "estimator": estimator,
+        "encoding": encoding,
+        "fit_seconds": fit_seconds,
+        f"raw_predict_ms_per_{predict_rows}": raw_predict_ms,
+        f"batch_predict_ms_per_{predict_rows}": batch_predict_ms,
+        "model_bytes": size_bytes,
+        "accuracy": accuracy,
+    }
+
+
+def benchmark_models(config_path="config.json", rows=1000, predict_rows=10000, configurations=CONFIGURATIONS):
+    data = HospitalMLModel().load_data(config_path, size=rows)
+    return [benchmark_configuration(estimator, encoding, data, predict_rows) for estimator, encoding in configurations]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare department model configurations.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--rows", type=int, default=1000, help="training rows")
+    parser.add_argument("--predict-rows", type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_models(args.config, args.rows, args.predict_rows), indent=2))
@@ -1,30 +1,101 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.preprocessing import OneHotEncoder
 import json
+import hashlib
+import os
+import threading
+import joblib
+from collections import Counter, OrderedDict
+from hospital_config import DEFAULT_MODEL_PATH, load_config
+from metrics import inc, timer
+from report_cache import get_data_generation
+
+FEATURE_COLUMNS = ['age', 'symptom_code']
+DB_FEATURE_COLUMNS = ['age', 'triage_level']
+TRAINING_SEED = 42
+TRAINING_CHUNK_SIZE = 50000
+
+# Appointments newer than a watermark with the patient's age (years, computed in
+# SQL from dob), triage level and the department that saw them; read by primary key order
+TRAINING_QUERY = (
+    "SELECT a.id, CAST((julianday('now') - julianday(p.dob)) / 365.25 AS INTEGER), p.triage_level, d.name "
+    "FROM appointments a JOIN patients p ON p.id = a.patient_id JOIN departments d ON d.id = a.department_id "
+    "WHERE a.id > ? ORDER BY a.id"
+)
+
+
+# Estimator choices: the original 100-tree forest and two lighter options.
+# hist_gb treats the second feature (symptom code / triage level) as categorical
+ESTIMATORS = {
+    'forest': lambda n_jobs: RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs),
+    'shallow_forest': lambda n_jobs: RandomForestClassifier(n_estimators=30, max_depth=8, random_state=42,
+                                                            n_jobs=n_jobs),
+    'hist_gb': lambda n_jobs: HistGradientBoostingClassifier(max_iter=50, max_depth=4, categorical_features=[1],
+                                                             random_state=42),
+}
+# 'onehot' one-hot encodes age and symptom_code (original); 'numeric' keeps age
+# numeric and symptom_code as a small int, giving two int16 columns
+ENCODINGS = ('onehot', 'numeric')
+
+
+def content_hash(config, data, settings=()):
+    """Hash of the model-relevant config, model settings and the training rows; a new hash means retrain."""
+    digest = hashlib.sha256(json.dumps(config.get('departments_info', []), sort_keys=True).encode('utf-8'))
+    digest.update(repr(settings).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
 
 class HospitalMLModel:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.encoder = OneHotEncoder()
+    def __init__(self, n_jobs=None, cache_size=0, estimator='forest', encoding='onehot'):
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator: {estimator}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        if estimator == 'hist_gb' and encoding == 'onehot':
+            raise ValueError("hist_gb needs encoding='numeric'")
+        self.estimator = estimator
+        self.encoding = encoding
+        self.model = ESTIMATORS[estimator](n_jobs)
+        self.encoder = OneHotEncoder() if encoding == 'onehot' else None
+        self.feature_columns = FEATURE_COLUMNS
         self.is_trained = False
+        # LRU of feature tuple -> department; 0 disables it. One model is shared by
+        # request threads: _cache_lock guards the LRU, _model_lock the n_jobs setting
+        # together with the predict call that relies on it
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._model_lock = threading.RLock()
+        self.data_hash = None
+        # Database training state: (age, triage_level, department) -> rows seen, the
+        # last appointment id counted, so refits only read appointments added since,
+        # and the data_version generation those ids belong to
+        self.training_counts = Counter()
+        self.last_appointment_id = 0
+        self.data_generation = None
 
-    def load_data(self, config_path='config.json'):
-        with open(config_path, 'r') as file:
-            config = json.load(file)
+    def load_data(self, config_path='config.json', seed=TRAINING_SEED, size=1000):
+        config = load_config(config_path)
         # Simulate data preparation based on the configuration
         # This part should ideally interact with real patient data
+        # Seeded so the same config yields the same data (and content hash)
+        rng = np.random.default_rng(seed)
         data = pd.DataFrame({
-            'age': np.random.randint(0, 100, size=1000),
-            'symptom_code': np.random.randint(1, 10, size=1000),
-            'department': np.random.choice([dept['name'] for dept in config['departments_info']], 1000)
+            'age': rng.integers(0, 100, size=size),
+            'symptom_code': rng.integers(1, 10, size=size),
+            'department': rng.choice([dept.name for dept in config.departments], size)
         })
         return data
 
     def prepare_features_labels(self, data):
-        features = self.encoder.fit_transform(data[['age', 'symptom_code']])
+        if self.encoder is None:
+            features = data[FEATURE_COLUMNS].to_numpy(dtype=np.int16)
+        else:
+            features = self.encoder.fit_transform(data[FEATURE_COLUMNS])
         labels = data['department']
         return features, labels
 
@@ -32,14 +103,191 @@ class HospitalMLModel:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         self.model.fit(X_train, y_train)
         self.is_trained = True
-        print(f"Model trained with accuracy: {self.model.score(X_test, y_test)}")
+        with self._cache_lock:
+            self._cache.clear()
+        accuracy = self.model.score(X_test, y_test)
+        print(f"Model trained with accuracy: {accuracy}")
+        return accuracy
+
+    def set_n_jobs(self, n_jobs):
+        # HistGradientBoosting has no n_jobs; it uses OpenMP threads
+        if n_jobs is not None and 'n_jobs' in self.model.get_params():
+            with self._model_lock:
+                self.model.set_params(n_jobs=n_jobs)
 
     def predict_department(self, features):
+        return self.predict_departments(pd.DataFrame([features]))[0]
+
+    def predict_departments(self, batch, n_jobs=None):
+        """
+        Predicts departments for many patients at once. `batch` is a DataFrame or
+        dict with 'age' and 'symptom_code' columns, or an (n, 2) array in that order.
+        Each distinct (age, symptom_code) pair is encoded and predicted once, in a
+        single pass, with `n_jobs` workers (defaults to the model's setting).
+        """
         if not self.is_trained:
             raise Exception("Model has not been trained yet.")
-        features = pd.DataFrame([features])
-        features_transformed = self.encoder.transform(features)
-        return self.model.predict(features_transformed)[0]
+        with timer("model_inference"):
+            return self._predict_departments(batch, n_jobs)
+
+    def _predict_departments(self, batch, n_jobs):
+        keys = self._feature_array(batch)
+        inc("model_predictions", len(keys))
+        if len(keys) == 0:
+            return np.empty(0, dtype=object)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        predictions = np.empty(len(unique), dtype=object)
+        missing = []
+        with self._cache_lock:
+            for i, key in enumerate(map(tuple, unique.tolist())):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    predictions[i] = self._cache[key]
+                else:
+                    missing.append(i)
+        if missing:
+            rows = unique[missing]
+            if self.encoder is not None:
+                rows = self.encoder.transform(pd.DataFrame(rows, columns=self.feature_columns))
+            with self._model_lock:
+                # A per-call n_jobs applies to this predict only; the model's own setting is put back
+                params = self.model.get_params(deep=False)
+                override = n_jobs is not None and 'n_jobs' in params
+                if override:
+                    self.model.set_params(n_jobs=n_jobs)
+                try:
+                    predictions[missing] = self.model.predict(rows)
+                finally:
+                    if override:
+                        self.model.set_params(n_jobs=params['n_jobs'])
+            if self.cache_size:
+                with self._cache_lock:
+                    for i in missing:
+                        self._cache[tuple(unique[i].tolist())] = predictions[i]
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return predictions[inverse.reshape(-1)]
+
+    def _feature_array(self, batch):
+        if isinstance(batch, pd.DataFrame):
+            return batch[self.feature_columns].to_numpy(dtype=np.int64)
+        if isinstance(batch, dict):
+            return np.column_stack([np.asarray(batch[column], dtype=np.int64) for column in self.feature_columns])
+        return np.asarray(batch, dtype=np.int64).reshape(-1, len(self.feature_columns))
+
+    def train_from_db(self, conn, chunk_size=TRAINING_CHUNK_SIZE):
+        """
+        Trains on (age, triage_level) -> department from the appointments table.
+
+        Rows are streamed in `chunk_size` batches and folded into counts per
+        distinct (age, triage_level, department), so memory depends on the number
+        of distinct combinations (a few thousand), not on the number of rows. The
+        forest is fit on those combinations weighted by their counts, with age
+        kept numeric. Calling it again only reads appointments added since the
+        last call and refits on the updated counts; returns the number of new rows.
+        """
+        generation = get_data_generation(conn)
+        if generation != self.data_generation:
+            # /create_db rebuilt the tables and appointment ids start over; so does counting
+            self.training_counts.clear()
+            self.last_appointment_id = 0
+            self.data_generation = generation
+        new_rows = 0
+        cursor = conn.execute(TRAINING_QUERY, (self.last_appointment_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            self.training_counts.update((age, triage, department) for _, age, triage, department in rows)
+            self.last_appointment_id = rows[-1][0]
+            new_rows += len(rows)
+        if not self.training_counts:
+            raise Exception("No appointments to train on.")
+        if new_rows == 0 and self.is_trained and self.feature_columns == DB_FEATURE_COLUMNS:
+            return 0
+
+        keys = list(self.training_counts)
+        X = np.array([key[:2] for key in keys], dtype=np.int16)
+        y = np.array([key[2] for key in keys], dtype=object)
+        weights = np.array([self.training_counts[key] for key in keys], dtype=np.float64)
+        self.model.fit(X, y, sample_weight=weights)
+        self.encoder = None
+        self.feature_columns = DB_FEATURE_COLUMNS
+        self.is_trained = True
+        with self._cache_lock:
+            self._cache.clear()
+        self.data_hash = hashlib.sha256(repr(sorted(self.training_counts.items())).encode('utf-8')).hexdigest()
+        print(f"Model trained on {int(weights.sum())} appointments ({new_rows} new, {len(keys)} distinct rows).")
+        return new_rows
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        if not self.is_trained:
+            raise Exception("Model has not been trained yet.")
+        # Uncompressed so load() can memory-map the tree arrays; written to a
+        # temporary file first so readers never see a partial artifact
+        tmp_path = f"{path}.tmp"
+        joblib.dump({'data_hash': self.data_hash, 'estimator': self.estimator, 'encoding': self.encoding,
+                     'model': self.model, 'encoder': self.encoder,
+                     'feature_columns': self.feature_columns, 'training_counts': self.training_counts,
+                     'last_appointment_id': self.last_appointment_id, 'data_generation': self.data_generation},
+                    tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH, mmap_mode='r', n_jobs=None, cache_size=0):
+        artifact = joblib.load(path, mmap_mode=mmap_mode)
+        ml = cls(n_jobs=n_jobs, cache_size=cache_size, estimator=artifact.get('estimator', 'forest'),
+                 encoding=artifact.get('encoding', 'onehot'))
+        ml.model = artifact['model']
+        ml.encoder = artifact['encoder']
+        ml.data_hash = artifact['data_hash']
+        ml.feature_columns = artifact.get('feature_columns', FEATURE_COLUMNS)
+        ml.training_counts = artifact.get('training_counts', Counter())
+        ml.last_appointment_id = artifact.get('last_appointment_id', 0)
+        ml.data_generation = artifact.get('data_generation')
+        ml.is_trained = True
+        ml.set_n_jobs(n_jobs)
+        return ml
+
+    @classmethod
+    def load_or_train(cls, config_path='config.json', path=DEFAULT_MODEL_PATH, n_jobs=None, cache_size=0,
+                      estimator='forest', encoding='onehot'):
+        """
+        Returns the saved model at `path` if it was trained on the same config,
+        settings and data; otherwise trains a new one and saves it there.
+        """
+        ml = cls(n_jobs=n_jobs, cache_size=cache_size, estimator=estimator, encoding=encoding)
+        config = load_config(config_path)
+        data = ml.load_data(config_path)
+        data_hash = content_hash(config, data, (estimator, encoding))
+        if os.path.exists(path):
+            saved = cls.load(path, n_jobs=n_jobs, cache_size=cache_size)
+            if saved.data_hash == data_hash:
+                return saved
+        X, y = ml.prepare_features_labels(data)
+        ml.train_model(X, y)
+        ml.data_hash = data_hash
+        ml.save(path)
+        return ml
+
+    @classmethod
+    def load_or_train_from_db(cls, conn, path=DEFAULT_MODEL_PATH, n_jobs=None, cache_size=0, estimator='forest'):
+        """
+        Loads the database-trained model at `path` (if any), folds in appointments
+        added since it was saved, and re-saves it only if there were new rows.
+        """
+        ml = None
+        if os.path.exists(path):
+            ml = cls.load(path, n_jobs=n_jobs, cache_size=cache_size)
+            if ml.feature_columns != DB_FEATURE_COLUMNS or ml.estimator != estimator:
+                # A synthetic-data model or a different estimator; replace it
+                ml = None
+        if ml is None:
+            ml = cls(n_jobs=n_jobs, cache_size=cache_size, estimator=estimator, encoding='numeric')
+        if ml.train_from_db(conn) or not os.path.exists(path):
+            ml.save(path)
+        return ml
 
     def main(self, config_path='config.json'):
         data = self.load_data(config_path)
@@ -47,5 +295,6 @@ class HospitalMLModel:
         self.train_model(X, y)
 
 if __name__ == "__main__":
-    ml_model = HospitalMLModel()
-    ml_model.main()
+    # Builds (or refreshes) the artifact the Flask app loads at first use
+    ml_model = HospitalMLModel.load_or_train()
+    print(f"Model artifact {DEFAULT_MODEL_PATH} is current (hash {ml_model.data_hash[:12]}).")
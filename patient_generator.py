@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import numpy as np
+from faker import Faker
+
+from bulk_load import DEFAULT_BATCH_SIZE
+
+GENDERS = np.array(['Male', 'Female'], dtype=object)
+MAX_AGE_DAYS = 100 * 365 + 24  # Same span as Faker's date_of_birth(minimum_age=0, maximum_age=99).
+MAX_ARRIVAL_OFFSET_SECONDS = 60 * 60
+DEFAULT_NAME_POOL_SIZE = 10000
+
+
+def build_name_pool(size, seed=None):
+    """Pre-samples `size` Faker names once; patients then index into the pool."""
+    fake = Faker()
+    if seed is not None:
+        fake.seed_instance(seed)
+    return np.array([fake.name() for _ in range(size)], dtype=object)
+
+
+def generate_patient_rows_vectorized(num_patients, seed=None, batch_size=DEFAULT_BATCH_SIZE, now=None,
+                                     name_pool_size=DEFAULT_NAME_POOL_SIZE):
+    """
+    Yields patient rows (name, dob, gender, triage_level, arrival_time) with the
+    same shape and distributions as the per-row Faker generator, but drawing
+    every field for a whole batch as NumPy arrays in one shot.
+    arrival_time is in epoch seconds, like the per-row generator.
+
+    The same `seed` (and `now`) always produces the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    now_epoch = int(now.timestamp())
+    today = np.datetime64(now.date(), 'D')
+    names = build_name_pool(max(1, min(name_pool_size, num_patients)), seed)
+
+    for start in range(0, num_patients, batch_size):
+        size = min(batch_size, num_patients - start)
+        name_idx = rng.integers(0, len(names), size)
+        genders = GENDERS[rng.integers(0, 2, size)]
+        triage_levels = rng.integers(1, 6, size)
+        dobs = today - rng.integers(0, MAX_AGE_DAYS, size).astype('timedelta64[D]')
+        arrivals = now_epoch - rng.integers(0, MAX_ARRIVAL_OFFSET_SECONDS // 60 + 1, size) * 60
+        yield from zip(
+            names[name_idx].tolist(),
+            dobs.astype(str).tolist(),
+            genders.tolist(),
+            triage_levels.tolist(),
+            arrivals.tolist(),
+        )
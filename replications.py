@@ -0,0 +1,157 @@
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from hospital_config import load_config
+from routing import RuleRouter
+from schema import CLINICAL_ROLES
+from simulation_engine import SimulationEngine, shift_windows
+
+METRICS = ("completed_per_day", "mean_wait_minutes", "p95_wait_minutes", "cancellation_rate", "unserved_rate")
+SIMULATION_START = date(2025, 1, 1)
+
+
+def build_staff(departments_info, shifts, rng, staffing_overrides=None):
+    """
+    Samples clinical staff in memory as (staff_id, department_id, shift), the same
+    way populate_departments_and_staff does. `staffing_overrides` maps
+    (department name, role) to a fixed headcount.
+    """
+    staffing_overrides = staffing_overrides or {}
+    staff = []
+    for dept_id, dept in enumerate(departments_info, start=1):
+        if not dept.get("is_clinical", False):
+            continue
+        for role, value in dept.get("staffing", {}).items():
+            if role not in CLINICAL_ROLES:
+                continue
+            count = staffing_overrides.get((dept["name"], role))
+            if count is None:
+                count = rng.randint(value["min"], value["max"])
+            for _ in range(count):
+                staff.append((f"S{len(staff) + 1}", dept_id, rng.choice(shifts)))
+    return staff
+
+
+def build_router(departments_info, staff, rules, seed):
+    """RuleRouter and capacities over the departments that have sampled clinical staff."""
+    staffed = {dept_id for _, dept_id, _ in staff}
+    departments = [(dept_id, dept["name"], dept.get("capacity", 0))
+                   for dept_id, dept in enumerate(departments_info, start=1) if dept_id in staffed]
+    return RuleRouter(rules, departments, seed), {dept_id: capacity for dept_id, _, capacity in departments}
+
+
+def run_replication(params):
+    """
+    Runs one seeded replication entirely in memory (no database) and returns its
+    summary statistics. Top-level so it can be shipped to worker processes.
+    """
+    rng = random.Random(params["seed"])
+    shifts = params["shifts"]
+    windows = shift_windows(shifts, params["shift_times"], SIMULATION_START, params["num_days"])
+    staff = build_staff(params["departments_info"], shifts, rng, params.get("staffing_overrides"))
+
+    horizon_start = min(start for _, start, _ in windows)
+    horizon_end = max(end for _, _, end in windows)
+    num_patients = params["num_patients"] * params["num_days"]
+    arrivals = sorted(rng.randint(horizon_start, horizon_end) for _ in range(num_patients))
+    patients = [(pid, rng.randint(1, 5), arrival) for pid, arrival in enumerate(arrivals)]
+
+    router = capacities = None
+    if params.get("matching") == "department":
+        router, capacities = build_router(params["departments_info"], staff, params.get("routing_rules"),
+                                          params["seed"])
+    engine = SimulationEngine(staff, windows, params["cancellation_rate"], rng,
+                              policy=params.get("policy", "fifo"),
+                              aging_per_minute=params.get("aging_per_minute", 0.0),
+                              router=router, capacities=capacities)
+    waits = sorted(appointment[-1] for appointment in engine.run(patients))
+
+    completed = engine.status_counts.get("completed", 0)
+    cancelled = engine.status_counts.get("cancelled", 0)
+    return {
+        "seed": params["seed"],
+        "completed_per_day": completed / params["num_days"],
+        "mean_wait_minutes": statistics.fmean(waits) if waits else 0.0,
+        "p95_wait_minutes": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+        "cancellation_rate": cancelled / len(waits) if waits else 0.0,
+        "unserved_rate": engine.unserved / num_patients if num_patients else 0.0,
+    }
+
+
+def summarize(results, metrics=METRICS, z=1.96):
+    """Mean, standard deviation and normal-approximation confidence interval per metric."""
+    summary = {}
+    for metric in metrics:
+        values = [result[metric] for result in results]
+        mean = statistics.fmean(values)
+        stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+        half_width = z * stdev / math.sqrt(len(values))
+        summary[metric] = {"mean": mean, "stdev": stdev, "ci_low": mean - half_width, "ci_high": mean + half_width}
+    return summary
+
+
+def replication_params(config, num_days=1, cancellation_rate=None, num_patients=None, staffing_overrides=None,
+                       policy=None, aging_per_minute=None, matching=None):
+    """Builds the per-replication parameters (minus the seed) from a loaded config."""
+    return {
+        "departments_info": config.get("departments_info", []),
+        "shifts": config.get("shifts", ["Day", "Night"]),
+        "shift_times": config.get("shift_times", {"Day": {"start": "07:00", "end": "19:00"}}),
+        "num_days": num_days,
+        "num_patients": num_patients if num_patients is not None else config.get("num_patients", 200),
+        "cancellation_rate": (cancellation_rate if cancellation_rate is not None
+                              else config.get("cancellation_rate", 0.1)),
+        "staffing_overrides": staffing_overrides,
+        "policy": policy or config.get("scheduling_policy", "fifo"),
+        "aging_per_minute": (aging_per_minute if aging_per_minute is not None
+                             else config.get("triage_aging_per_minute", 0.0)),
+        "matching": matching or config.get("matching", "global"),
+        "routing_rules": config.get("routing_rules", []),
+    }
+
+
+def run_parallel(params_list, max_workers=None):
+    """Runs run_replication over `params_list` on a process pool, preserving order."""
+    workers = max_workers or os.cpu_count() or 1
+    # A few chunks per worker keeps IPC overhead low while still balancing load.
+    chunksize = max(1, len(params_list) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_replication, params_list, chunksize=chunksize))
+
+
+def run_replications(base_params, num_replications, base_seed=0, max_workers=None):
+    """
+    Fans `num_replications` independently seeded runs of `base_params` out over a
+    process pool and returns (per-replication results, aggregated summary).
+    Nothing is written to hospital_simulation.db.
+    """
+    params = [dict(base_params, seed=base_seed + i) for i in range(num_replications)]
+    results = run_parallel(params, max_workers)
+    return results, summarize(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run seeded Monte Carlo replications of the simulation in parallel.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--replications", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--cancellation-rate", type=float, default=None)
+    parser.add_argument("--num-patients", type=int, default=None, help="patients per day")
+    parser.add_argument("--policy", choices=("fifo", "triage"), default=None)
+    parser.add_argument("--aging", type=float, default=None, help="triage priority gained per minute waited")
+    parser.add_argument("--matching", choices=("global", "department"), default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    loaded_config = load_config(args.config)
+    base = replication_params(loaded_config, args.days, args.cancellation_rate, args.num_patients,
+                              policy=args.policy, aging_per_minute=args.aging, matching=args.matching)
+    _, aggregate = run_replications(base, args.replications, args.seed, args.workers)
+    print(json.dumps(aggregate, indent=2))
@@ -0,0 +1,81 @@
+import base64
+import json
+import threading
+
+from metrics import inc, timer
+
+
+def get_data_version(conn):
+    return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def get_data_generation(conn):
+    """Identifies the current build of the simulation tables; changes only when /create_db rebuilds them."""
+    return conn.execute("SELECT generation FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def bump_data_version(conn):
+    """Marks the data as changed; call from every path that writes simulation data."""
+    conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+
+
+def record_appointments(conn, status_counts):
+    """Adds newly written appointments to the status summary and bumps the data version."""
+    conn.executemany(
+        "INSERT INTO appointment_status_counts (status, count) VALUES (?, ?) "
+        "ON CONFLICT(status) DO UPDATE SET count = count + excluded.count",
+        list(status_counts.items())
+    )
+    bump_data_version(conn)
+
+
+def read_status_counts(conn):
+    rows = conn.execute("SELECT status, count FROM appointment_status_counts WHERE count > 0 ORDER BY status")
+    return {status: count for status, count in rows}
+
+
+class CachedReport:
+    """A rendered report for one data version, with everything a response needs precomputed."""
+
+    __slots__ = ("version", "status_counts", "chart_png", "chart_base64", "etag", "json_body")
+
+    def __init__(self, version, status_counts, chart_png):
+        self.version = version
+        self.status_counts = status_counts
+        self.chart_png = chart_png
+        self.chart_base64 = base64.b64encode(chart_png).decode('utf-8')
+        self.etag = f"report-{version}"
+        self.json_body = json.dumps({"report": status_counts, "chart": self.chart_base64})
+
+
+class ReportCache:
+    """
+    Keeps the last rendered report and re-renders only when the data version
+    moves. A poll with unchanged data costs one primary-key lookup.
+    `render_chart(status_counts)` must return PNG bytes.
+    """
+
+    def __init__(self, render_chart):
+        self._render_chart = render_chart
+        self._report = None
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        version = get_data_version(conn)
+        report = self._report
+        if report is not None and report.version == version:
+            inc("report_cache_hits")
+            return report
+        # One thread renders; the chart backend is not thread-safe anyway.
+        with self._lock:
+            report = self._report
+            if report is None or report.version != version:
+                inc("report_cache_misses")
+                status_counts = read_status_counts(conn)
+                with timer("report_render"):
+                    chart_png = self._render_chart(status_counts)
+                report = self._report = CachedReport(version, status_counts, chart_png)
+        return report
+
+    def clear(self):
+        self._report = None
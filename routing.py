@@ -0,0 +1,52 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from schema import CLINICAL_ROLES
+
+
+class RuleRouter:
+    """
+    Routes a patient (patient_id, triage_level, arrival) to a department id.
+
+    Rules are checked in order; each is {"department": name} plus optional
+    "min_triage" / "max_triage" bounds. Patients no rule matches are spread over
+    the departments in proportion to their capacity, using a hash of the patient
+    id so the same patient always lands in the same department.
+    """
+
+    def __init__(self, rules, departments, seed=0):
+        # departments: iterable of (department_id, name, capacity) that have clinical staff
+        departments = list(departments)
+        ids_by_name = {name: dept_id for dept_id, name, _ in departments}
+        self.rules = [
+            (rule.get("min_triage", 1), rule.get("max_triage", 5), ids_by_name[rule["department"]])
+            for rule in rules or () if rule["department"] in ids_by_name
+        ]
+        self.department_ids = [dept_id for dept_id, _, _ in departments]
+        self.cumulative_capacity = list(accumulate(max(1, capacity or 0) for _, _, capacity in departments))
+        self.seed = seed or 0
+
+    def __call__(self, patient):
+        pid, triage, _ = patient
+        for min_triage, max_triage, dept_id in self.rules:
+            if min_triage <= triage <= max_triage:
+                return dept_id
+        if not self.department_ids:
+            return None
+        slot = (pid * 2654435761 + self.seed) % self.cumulative_capacity[-1]
+        return self.department_ids[bisect_right(self.cumulative_capacity, slot)]
+
+
+def department_router(conn, rules, seed=0):
+    """
+    Builds a RuleRouter over the clinical departments that have clinical staff,
+    and returns it with {department_id: bed capacity} for the engine.
+    """
+    departments = conn.execute(
+        f"SELECT d.id, d.name, d.capacity FROM departments d WHERE d.is_clinical = 1 AND EXISTS "
+        f"(SELECT 1 FROM staff s WHERE s.department_id = d.id AND s.role IN "
+        f"({','.join('?' * len(CLINICAL_ROLES))})) ORDER BY d.id",
+        CLINICAL_ROLES
+    ).fetchall()
+    capacities = {dept_id: capacity for dept_id, _, capacity in departments}
+    return RuleRouter(rules, departments, seed), capacities
@@ -0,0 +1,235 @@
+# Database schema and migrations for the hospital simulation.
+# The schema version is tracked in PRAGMA user_version; every entry in MIGRATIONS
+# moves the database one version forward, so migrate() upgrades an existing
+# hospital_simulation.db in place and create_schema() builds a fresh one.
+
+TABLES = ("medical_records", "appointments", "patients", "staff", "departments",
+          "appointment_status_counts", "data_version")
+
+CLINICAL_ROLES = (
+    "Doctor", "Registered Nurse", "Nursing Assistant", "Respiratory Therapist",
+    "Radiology Technician", "Ophthalmic Technician", "Physical Therapist"
+)
+
+MIGRATIONS = [
+    # 1: base tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            capacity INTEGER DEFAULT 0,
+            is_clinical INTEGER DEFAULT 0
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS staff (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            department_id INTEGER,
+            availability TEXT DEFAULT 'available',
+            shift TEXT DEFAULT 'day',
+            FOREIGN KEY (department_id) REFERENCES departments(id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            dob DATE,
+            gender TEXT,
+            triage_level INTEGER DEFAULT 1,
+            arrival_time DATETIME DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER,
+            staff_id TEXT,
+            department_id INTEGER,
+            scheduled_time DATETIME,
+            duration INTEGER,
+            status TEXT DEFAULT 'scheduled',
+            FOREIGN KEY (patient_id) REFERENCES patients(id),
+            FOREIGN KEY (staff_id) REFERENCES staff(id),
+            FOREIGN KEY (department_id) REFERENCES departments(id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS medical_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER,
+            staff_id TEXT,
+            record_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            diagnosis TEXT,
+            treatment TEXT,
+            notes TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patients(id),
+            FOREIGN KEY (staff_id) REFERENCES staff(id)
+        )''',
+    ],
+    # 2: covering indexes for the simulation's hot queries
+    [
+        "CREATE INDEX IF NOT EXISTS idx_staff_shift_role ON staff (shift, role, id, department_id)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_arrival_time ON patients (arrival_time, triage_level)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_status ON appointments (status)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_department_time ON appointments (department_id, scheduled_time)",
+    ],
+    # 3: patients.arrival_time holds integer epoch seconds (local time) instead of
+    # 'YYYY-MM-DD HH:MM:SS' text, so shift windows are integer range scans
+    [
+        "UPDATE patients SET arrival_time = CAST(strftime('%s', arrival_time, 'utc') AS INTEGER) "
+        "WHERE typeof(arrival_time) = 'text'",
+    ],
+    # 4: report summary, maintained incrementally by the writers, and a data version
+    # counter they bump. The version starts at the creation time in milliseconds so a
+    # recreated database never reuses a version an old report cache has seen.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS appointment_status_counts (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )''',
+        "INSERT OR IGNORE INTO appointment_status_counts (status, count) "
+        "SELECT status, COUNT(*) FROM appointments GROUP BY status",
+        '''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO data_version (id, version) "
+        "VALUES (1, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))",
+    ],
+    # 5: per-patient wait (appointment start - arrival) in minutes
+    [
+        "ALTER TABLE appointments ADD COLUMN wait_minutes REAL",
+    ],
+    # 6: background jobs (see jobs.py). Not in TABLES: job history survives /create_db,
+    # which may itself be running as a job.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    ],
+    # 7: ID sequences (see id_allocator.py). Not in TABLES either: IDs handed out
+    # before a /create_db are never handed out again.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )''',
+    ],
+    # 8: the process running a job, so startup recovery only fails jobs whose owner is gone
+    [
+        "ALTER TABLE jobs ADD COLUMN owner_pid INTEGER",
+    ],
+    # 9: which build of the simulation tables the data belongs to. Set when data_version
+    # is created (create_schema gives it a new value) and, unlike version, never bumped
+    [
+        "ALTER TABLE data_version ADD COLUMN generation INTEGER",
+        "UPDATE data_version SET generation = version",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Migrations that only touch tables outside TABLES. Those tables survive
+# create_schema(), so it does not run these again.
+PRESERVED_MIGRATIONS = (6, 7, 8)
+
+# The queries the simulation runs on every shift/report, with sample parameters,
+# and the index each one is expected to use.
+STAFF_ON_SHIFT_QUERY = (
+    f"SELECT id, department_id FROM staff WHERE role IN ({','.join('?' * len(CLINICAL_ROLES))}) AND shift = ?"
+)
+PATIENTS_IN_WINDOW_QUERY = (
+    "SELECT id, triage_level, arrival_time FROM patients "
+    "WHERE arrival_time BETWEEN ? AND ? ORDER BY arrival_time"
+)
+STATUS_COUNTS_QUERY = "SELECT status, COUNT(*) FROM appointments GROUP BY status"
+DEPARTMENT_APPOINTMENTS_QUERY = (
+    "SELECT id, staff_id, scheduled_time FROM appointments "
+    "WHERE department_id = ? AND scheduled_time BETWEEN ? AND ?"
+)
+
+HOT_QUERIES = {
+    "staff_on_shift": (STAFF_ON_SHIFT_QUERY, (*CLINICAL_ROLES, "Day"), "idx_staff_shift_role"),
+    "patients_in_window": (PATIENTS_IN_WINDOW_QUERY, (1735714800, 1735758000), "idx_patients_arrival_time"),
+    "status_counts": (STATUS_COUNTS_QUERY, (), "idx_appointments_status"),
+    "department_appointments": (DEPARTMENT_APPOINTMENTS_QUERY, (1, "2025-01-01 07:00:00", "2025-01-01 19:00:00"),
+                                "idx_appointments_department_time"),
+}
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Applies any migrations newer than the database's user_version. Returns the new version."""
+    version = get_schema_version(conn)
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        with conn:
+            for statement in MIGRATIONS[target - 1]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version={target}")
+    return SCHEMA_VERSION
+
+
+def create_schema(conn):
+    """
+    Drops every simulation table (TABLES) and rebuilds it at the latest version.
+    The database is migrated first and user_version is left alone, because the
+    tables outside TABLES are kept as they are.
+    """
+    migrate(conn)
+    with conn:
+        for table in TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for version, statements in enumerate(MIGRATIONS, start=1):
+            if version not in PRESERVED_MIGRATIONS:
+                for statement in statements:
+                    conn.execute(statement)
+    return SCHEMA_VERSION
+
+
+def explain_query_plan(conn, sql, params=()):
+    """Returns the EXPLAIN QUERY PLAN detail lines for `sql`."""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(conn):
+    """
+    Checks that every query in HOT_QUERIES is served by its index rather than a
+    table scan. Returns {name: plan} for the queries that regressed (empty if all pass).
+    """
+    regressions = {}
+    for name, (sql, params, index_name) in HOT_QUERIES.items():
+        plan = explain_query_plan(conn, sql, params)
+        uses_index = any(index_name in detail for detail in plan)
+        if not uses_index or any("USE TEMP B-TREE" in detail for detail in plan):
+            regressions[name] = plan
+    return regressions
+
+
+if __name__ == "__main__":
+    import sqlite3
+
+    memory_conn = sqlite3.connect(":memory:")
+    create_schema(memory_conn)
+    failures = check_query_plans(memory_conn)
+    for query_name, query_plan in failures.items():
+        print(f"{query_name}: expected index not used -> {query_plan}")
+    if failures:
+        raise SystemExit(1)
+    print(f"All {len(HOT_QUERIES)} hot queries use their indexes (schema version {SCHEMA_VERSION}).")
@@ -0,0 +1,546 @@
+import heapq
+import random
+import sqlite3
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from bulk_load import DEFAULT_BATCH_SIZE, bulk_insert
+from dispatcher import IndexedDispatcher
+from entity_store import PatientStore, StaffStore
+from metrics import inc, observe
+from report_cache import record_appointments
+from schema import CLINICAL_ROLES, PATIENTS_IN_WINDOW_QUERY
+
+# Event kinds. At equal timestamps events are handled in this order, so a
+# clinician finishing at a shift boundary is released before the shift
+# changes, and a patient arriving exactly at shift end can still be seen
+# (matching simulate_shift, which allows appointment_start == shift_end).
+COMPLETION = 0
+SHIFT_START = 1
+ARRIVAL = 2
+SHIFT_END = 3
+
+# Queued events are single ints that order like (time, kind, sequence): from
+# the top, the time (non-negative epoch seconds), the 2-bit kind, a sequence
+# number, and in the low bits the payload (a clinician index for completions,
+# an index into the engine's shift names for shift starts and ends).
+EVENT_PAYLOAD_BITS = 32
+EVENT_SEQ_BITS = 38
+EVENT_KIND_SHIFT = EVENT_PAYLOAD_BITS + EVENT_SEQ_BITS
+EVENT_TIME_SHIFT = EVENT_KIND_SHIFT + 2
+EVENT_PAYLOAD_MASK = (1 << EVENT_PAYLOAD_BITS) - 1
+
+APPOINTMENT_INSERT = (
+    "INSERT INTO appointments (patient_id, staff_id, department_id, scheduled_time, duration, status, wait_minutes) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+WAIT_PERCENTILES = (50, 95, 99)
+
+# Simulation modes for run_windows:
+#   stream   - appointments are written in batches while the simulation runs
+#   buffered - appointments are kept in memory and written once at the end
+#   memory   - buffered, and the patients in the window are first read into an
+#              in-memory table, so the run itself does no disk I/O; only the
+#              new appointments and summary rows are written back to disk
+SIMULATION_MODES = ("stream", "buffered", "memory")
+
+# A run's progress callback is called once per this many events (or patients)
+PROGRESS_EVERY = 5000
+APPOINTMENT_STATUSES = ("completed", "cancelled")
+
+
+def shift_bounds(day, start_str, end_str):
+    """
+    Returns (start, end) datetimes of a shift that starts on `day`.
+    A shift whose end is not after its start (e.g. Night 19:00-07:00) ends the next day.
+    """
+    start = datetime.combine(day, datetime.strptime(start_str, "%H:%M").time())
+    end = datetime.combine(day, datetime.strptime(end_str, "%H:%M").time())
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def shift_windows(shifts, shift_times, start_date, num_days):
+    """Returns [(shift, start_epoch, end_epoch)] for every shift on every day, in start order."""
+    windows = []
+    for offset in range(num_days):
+        day = start_date + timedelta(days=offset)
+        for shift in shifts:
+            times = shift_times.get(shift)
+            if not times:
+                continue
+            start, end = shift_bounds(day, times["start"], times["end"])
+            windows.append((shift, int(start.timestamp()), int(end.timestamp())))
+    windows.sort(key=lambda window: window[1])
+    return windows
+
+
+class FifoQueue:
+    """
+    Waiting patients seen strictly in arrival order. Holds PatientStore slots in
+    an int64 array used as a queue; the consumed head is dropped once it is at
+    least half of the array.
+    """
+
+    __slots__ = ("_slots", "_head")
+
+    def __init__(self):
+        self._slots = array('q')
+        self._head = 0
+
+    def push(self, slot, triage, arrival):
+        self._slots.append(slot)
+
+    def pop(self):
+        slot = self._slots[self._head]
+        self._head += 1
+        if self._head * 2 >= len(self._slots):
+            del self._slots[:self._head]
+            self._head = 0
+        return slot
+
+    def __len__(self):
+        return len(self._slots) - self._head
+
+
+class TriageQueue:
+    """
+    Waiting patients seen by triage level (5 = most urgent), then arrival.
+
+    With aging, a patient's priority rises by `aging_per_minute` for every minute
+    waited. Every waiting patient ages at the same rate, so the ordering at any
+    moment is by triage - aging_per_minute * arrival_minutes: a fixed key per
+    patient, and the heap never has to be re-keyed.
+    """
+
+    __slots__ = ("aging_per_minute", "_heap", "_seq")
+
+    def __init__(self, aging_per_minute=0.0):
+        self.aging_per_minute = aging_per_minute
+        self._heap = []
+        self._seq = 0
+
+    def push(self, slot, triage, arrival):
+        self._seq += 1
+        priority = triage - self.aging_per_minute * arrival / 60
+        heapq.heappush(self._heap, (-priority, arrival, self._seq, slot))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[3]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+def waiting_queue(policy="fifo", aging_per_minute=0.0):
+    """
+    Returns an empty waiting queue for a scheduling policy: 'fifo' or 'triage'.
+    Queues hold PatientStore slots: push(slot, triage, arrival), pop() -> slot.
+    """
+    if policy == "triage":
+        return TriageQueue(aging_per_minute)
+    if policy == "fifo":
+        return FifoQueue()
+    raise ValueError(f"Unknown scheduling policy: {policy}")
+
+
+class WaitStats:
+    """Per-triage-level wait times (minutes) of scheduled patients, and counts of those never seen."""
+
+    def __init__(self):
+        self.waits_by_triage = {}
+        self.unserved_by_triage = {}
+
+    def add_unserved(self, triage, count=1):
+        """Counts patients of a triage level who were still waiting when the run ended."""
+        self.unserved_by_triage[triage] = self.unserved_by_triage.get(triage, 0) + count
+
+    def add(self, triage, wait_minutes):
+        waits = self.waits_by_triage.get(triage)
+        if waits is None:
+            waits = self.waits_by_triage[triage] = array('d')
+        waits.append(wait_minutes)
+
+    def percentiles(self, percentiles=WAIT_PERCENTILES):
+        """
+        Returns {triage_level: {"count": n, "unserved": u, "p50": .., "p95": .., "p99": ..}}
+        (nearest-rank). The percentiles cover only the n patients who were seen, so read
+        them together with the u who never were; with none seen they are None.
+        """
+        summary = {}
+        for triage in sorted(self.waits_by_triage.keys() | self.unserved_by_triage.keys()):
+            waits = sorted(self.waits_by_triage.get(triage, ()))
+            stats = {"count": len(waits), "unserved": self.unserved_by_triage.get(triage, 0)}
+            for p in percentiles:
+                stats[f"p{p}"] = waits[max(0, -(-p * len(waits) // 100) - 1)] if waits else None
+            summary[triage] = stats
+        return summary
+
+
+class AppointmentColumns:
+    """
+    Appointments held as typed array columns (about 40 bytes each) until they are
+    written with one executemany in flush(). Staff ids and statuses are stored as
+    small ints indexing `staff_ids` / APPOINTMENT_STATUSES.
+    """
+
+    def __init__(self):
+        self.patient_id = array('q')
+        self.staff = array('l')
+        self.department_id = array('l')
+        self.start = array('q')
+        self.duration = array('h')
+        self.status = array('b')
+        self.wait_minutes = array('d')
+        self.staff_ids = []
+        self._staff_index = {}
+
+    def append(self, patient_id, staff_id, department_id, start_epoch, duration, status, wait_minutes):
+        index = self._staff_index.get(staff_id)
+        if index is None:
+            index = self._staff_index[staff_id] = len(self.staff_ids)
+            self.staff_ids.append(staff_id)
+        self.patient_id.append(patient_id)
+        self.staff.append(index)
+        self.department_id.append(department_id)
+        self.start.append(start_epoch)
+        self.duration.append(duration)
+        self.status.append(APPOINTMENT_STATUSES.index(status))
+        self.wait_minutes.append(wait_minutes)
+
+    def extend(self, appointments):
+        for appointment in appointments:
+            self.append(*appointment)
+        return self
+
+    def __len__(self):
+        return len(self.patient_id)
+
+    def rows(self):
+        """Yields rows for APPOINTMENT_INSERT."""
+        staff_ids = self.staff_ids
+        for pid, staff, dept_id, start, duration, status, wait in zip(
+                self.patient_id, self.staff, self.department_id, self.start, self.duration, self.status,
+                self.wait_minutes):
+            yield pid, staff_ids[staff], dept_id, datetime.fromtimestamp(start), duration, \
+                APPOINTMENT_STATUSES[status], wait
+
+    def flush(self, conn):
+        """Writes every buffered appointment in one executemany and one transaction."""
+        with conn:
+            conn.executemany(APPOINTMENT_INSERT, self.rows())
+        return len(self)
+
+
+@contextmanager
+def patients_in_memory(conn, start, end):
+    """
+    Yields an in-memory database holding a `patients` table with the patients
+    of `conn` who arrive between `start` and `end`, read in one pass. Nothing is
+    ever copied back: writers on other connections are unaffected.
+    """
+    memory = sqlite3.connect(":memory:")
+    try:
+        # Same index as on disk, and rows kept in disk order, so ties come back in the same order
+        memory.execute("CREATE TABLE patients (id INTEGER, triage_level INTEGER, arrival_time INTEGER)")
+        memory.execute("CREATE INDEX idx_patients_arrival_time ON patients (arrival_time, triage_level)")
+        with memory:
+            memory.executemany("INSERT INTO patients (id, triage_level, arrival_time) VALUES (?, ?, ?)",
+                               conn.execute(PATIENTS_IN_WINDOW_QUERY, (start, end)))
+        yield memory
+    finally:
+        memory.close()
+
+
+class SimulationEngine:
+    """
+    Discrete-event simulation of clinicians seeing patients across many shifts.
+
+    The event queue holds clinician completions and shift starts/ends; patient
+    arrivals are merged in lazily from an iterator already sorted by arrival
+    time, so memory does not grow with the number of patients. Clinician state
+    (busy until, on/off duty) and the queue of waiting patients carry over
+    shift boundaries: a clinician finishes the patient in hand after their
+    shift ends, and patients still waiting are seen by the next shift.
+
+    Waiting patients are ordered by `policy` ('fifo' or 'triage', see TriageQueue).
+    Times are integer epoch seconds throughout.
+
+    Without a `router`, any idle clinician may see any patient (one shared pool).
+    With one, `router(patient)` picks the patient's department and matching runs
+    per department: each has its own idle-clinician heap and waiting queue, so an
+    assignment costs O(log S_dept), and no more than `capacities[department_id]`
+    patients are in service there at once (missing or 0 means unlimited).
+
+    Internally clinicians are dense indexes into a StaffStore and waiting
+    patients are slots in a PatientStore (see entity_store), so per-entity state
+    is a few bytes of array columns; string staff ids only reappear in the
+    appointments yielded by run().
+    """
+
+    def __init__(self, staff, windows, cancellation_rate, rng=random, duration_range=(15, 45),
+                 dispatcher_cls=IndexedDispatcher, policy="fifo", aging_per_minute=0.0, router=None,
+                 capacities=None):
+        # staff: iterable of (staff_id, department_id, shift)
+        self.cancellation_rate = cancellation_rate
+        self.rng = rng
+        self.duration_range = duration_range
+        self.router = router
+        self.capacities = capacities or {}
+        self.staff = StaffStore(staff)
+        self.staff_by_shift = self.staff.by_shift()
+        self.patients = PatientStore()
+        self.dispatcher_cls = dispatcher_cls
+        self.policy = policy
+        self.aging_per_minute = aging_per_minute
+        # Pool key -> idle clinicians / waiting patients / patients in service.
+        # The key is the department id when routing, else None (a single pool).
+        self.idle = {}
+        self.waiting = {}
+        self.in_service = {}
+        self._dirty = {}
+        self.wait_stats = WaitStats()
+        self.events = []
+        self._seq = 0
+        self._shift_names = []
+        for shift, start, end in windows:
+            self._schedule(start, SHIFT_START, shift)
+            self._schedule(end, SHIFT_END, shift)
+        self.horizon_start = min((start for _, start, _ in windows), default=0)
+        self.horizon_end = max((end for _, _, end in windows), default=0)
+        self.events_processed = 0
+        self.status_counts = {}
+
+    @property
+    def unserved(self):
+        """Number of patients still waiting."""
+        return sum(len(queue) for queue in self.waiting.values())
+
+    def _schedule(self, at, kind, payload):
+        if kind != COMPLETION:
+            if payload not in self._shift_names:
+                self._shift_names.append(payload)
+            payload = self._shift_names.index(payload)
+        self._seq += 1
+        heapq.heappush(self.events, (((at << 2 | kind) << EVENT_KIND_SHIFT) | self._seq << EVENT_PAYLOAD_BITS
+                                     | payload))
+
+    def _unpack(self, event):
+        """Returns (time, kind, payload) of a queued event."""
+        prefix = event >> EVENT_KIND_SHIFT
+        kind = prefix & 3
+        payload = event & EVENT_PAYLOAD_MASK
+        if kind != COMPLETION:
+            payload = self._shift_names[payload]
+        return prefix >> 2, kind, payload
+
+    def _pool_of(self, index):
+        return self.staff.department[index] if self.router is not None else None
+
+    def _idle_pool(self, pool):
+        idle = self.idle.get(pool)
+        if idle is None:
+            idle = self.idle[pool] = self.dispatcher_cls([], None)
+        return idle
+
+    def _release(self, index, at):
+        pool = self._pool_of(index)
+        self._idle_pool(pool).push(index, at)
+        self._dirty[pool] = None
+
+    def _handle(self, at, kind, payload):
+        # Completion and shift payloads are clinician indexes / shift names;
+        # an arrival's payload is the (patient_id, triage_level, arrival) row
+        staff = self.staff
+        if kind == COMPLETION:
+            staff.busy[payload] = 0
+            pool = self._pool_of(payload)
+            self.in_service[pool] -= 1
+            self._dirty[pool] = None
+            if staff.on_duty[payload]:
+                self._release(payload, at)
+        elif kind == SHIFT_START:
+            for index in self.staff_by_shift.get(payload, ()):
+                staff.on_duty[index] = 1
+                if not staff.busy[index]:
+                    self._release(index, at)
+        elif kind == SHIFT_END:
+            for index in self.staff_by_shift.get(payload, ()):
+                staff.on_duty[index] = 0
+                idle = self.idle.get(self._pool_of(index))
+                if idle is not None and index in idle:
+                    idle.remove(index)
+        else:
+            pool = self.router(payload) if self.router is not None else None
+            queue = self.waiting.get(pool)
+            if queue is None:
+                queue = self.waiting[pool] = waiting_queue(self.policy, self.aging_per_minute)
+            pid, triage, arrival = payload
+            queue.push(self.patients.add(pid, triage, arrival), triage, arrival)
+            self._dirty[pool] = None
+
+    def _dispatch(self, now):
+        """Runs matching in every pool whose clinicians, patients or capacity changed."""
+        dirty, self._dirty = self._dirty, {}
+        for pool in dirty:
+            yield from self._dispatch_pool(pool, now)
+
+    def _dispatch_pool(self, pool, now):
+        """Assigns a pool's waiting patients, in queue order, to its longest-idle on-duty clinicians."""
+        waiting = self.waiting.get(pool)
+        idle = self.idle.get(pool)
+        if not waiting or idle is None:
+            return
+        low, high = self.duration_range
+        staff = self.staff
+        capacity = self.capacities.get(pool) or 0
+        in_service = self.in_service.get(pool, 0)
+        while waiting:
+            if capacity and in_service >= capacity:
+                break
+            earliest = idle.peek()
+            if earliest is None:
+                break
+            index, _ = earliest
+            pid, triage, arrival = self.patients.release(waiting.pop())
+            wait_minutes = (now - arrival) / 60
+            self.wait_stats.add(triage, wait_minutes)
+            duration = self.rng.randint(low, high)
+            if self.rng.random() < self.cancellation_rate:
+                status = "cancelled"
+            else:
+                status = "completed"
+                idle.pop()
+                staff.busy[index] = 1
+                in_service += 1
+                self._schedule(now + duration * 60, COMPLETION, index)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            yield pid, staff.ids[index], staff.department[index], now, duration, status, wait_minutes
+        self.in_service[pool] = in_service
+
+    def progress(self, now):
+        """Fraction of the simulated horizon that lies before `now`, between 0 and 1."""
+        span = self.horizon_end - self.horizon_start
+        return min(1.0, max(0.0, (now - self.horizon_start) / span)) if span > 0 else 1.0
+
+    def run(self, patients, report_progress=None):
+        """
+        Runs the simulation over `patients`, an iterable of (patient_id, triage_level,
+        arrival_epoch) sorted by arrival. Yields appointments as
+        (patient_id, staff_id, department_id, start_epoch, duration, status, wait_minutes).
+        Patients still waiting when the last shift ends are left in self.waiting
+        (see `unserved`) and counted per triage level in wait_stats. report_progress(fraction),
+        if given, is called every PROGRESS_EVERY events with the share of simulated time
+        covered so far.
+        """
+        arrivals = iter(patients)
+        next_arrival = next(arrivals, None)
+        events = self.events
+        report_at = self.events_processed + PROGRESS_EVERY if report_progress else -1
+        while events or next_arrival is not None:
+            # Take the next arrival if it comes before (or ties with a later-ordered) queued event.
+            if next_arrival is not None and (
+                    not events or (next_arrival[2] << 2 | ARRIVAL) < events[0] >> EVENT_KIND_SHIFT):
+                now = next_arrival[2]
+                if now > self.horizon_end:
+                    next_arrival = None
+                    continue
+                self._handle(now, ARRIVAL, tuple(next_arrival))
+                next_arrival = next(arrivals, None)
+            else:
+                now, kind, payload = self._unpack(heapq.heappop(events))
+                if kind == SHIFT_END:
+                    # Clinicians can still start a patient at the very end of their shift.
+                    yield from self._dispatch(now)
+                self._handle(now, kind, payload)
+            self.events_processed += 1
+            if self.events_processed == report_at:
+                report_progress(self.progress(now))
+                report_at += PROGRESS_EVERY
+            # Apply every event at this timestamp before assigning anyone.
+            if events and events[0] >> EVENT_TIME_SHIFT == now:
+                continue
+            if next_arrival is not None and next_arrival[2] == now:
+                continue
+            yield from self._dispatch(now)
+        for triage, count in self.patients.triage_counts().items():
+            self.wait_stats.add_unserved(triage, count)
+
+
+def run_days(conn, shifts, shift_times, num_days=1, start_date=None, cancellation_rate=0.1,
+             rng=random, batch_size=DEFAULT_BATCH_SIZE, policy="fifo", aging_per_minute=0.0, router=None,
+             capacities=None, mode="stream", report_progress=None):
+    """
+    Simulates `num_days` consecutive days of every configured shift in one run,
+    reading clinical staff and patient arrivals from the database and writing
+    appointments back in batches. Returns a summary dict.
+    """
+    start_date = start_date or datetime.now().date()
+    windows = shift_windows(shifts, shift_times, start_date, num_days)
+    return run_windows(conn, windows, cancellation_rate, rng, batch_size, policy, aging_per_minute, router,
+                       capacities, mode, report_progress)
+
+
+def run_windows(conn, windows, cancellation_rate=0.1, rng=random, batch_size=DEFAULT_BATCH_SIZE,
+                policy="fifo", aging_per_minute=0.0, router=None, capacities=None, mode="stream",
+                report_progress=None):
+    """
+    Runs the engine over explicit (shift, start_epoch, end_epoch) windows against the database.
+    Pass `router`/`capacities` (see routing.department_router) for department-aware matching,
+    `mode` (see SIMULATION_MODES) to choose how appointments reach the database, and
+    `report_progress` to be told how far through the simulated time the run is.
+    """
+    if mode not in SIMULATION_MODES:
+        raise ValueError(f"Unknown simulation mode: {mode}")
+    if not windows:
+        return {"appointments": 0, "events": 0, "unserved": 0, "status_counts": {}, "wait_percentiles": {}}
+
+    shifts = sorted({shift for shift, _, _ in windows})
+    placeholders = ','.join('?' * len(shifts))
+    staff = conn.execute(
+        f"SELECT id, department_id, shift FROM staff WHERE role IN ({','.join('?' * len(CLINICAL_ROLES))}) "
+        f"AND shift IN ({placeholders})",
+        (*CLINICAL_ROLES, *shifts)
+    ).fetchall()
+    engine = SimulationEngine(staff, windows, cancellation_rate, rng, policy=policy,
+                              aging_per_minute=aging_per_minute, router=router, capacities=capacities)
+
+    started = time.perf_counter()
+    horizon_start = min(start for _, start, _ in windows)
+    window = (horizon_start, engine.horizon_end)
+    if mode == "memory":
+        with patients_in_memory(conn, *window) as memory:
+            patients = memory.execute(PATIENTS_IN_WINDOW_QUERY, window)
+            buffer = AppointmentColumns().extend(engine.run(patients, report_progress))
+    else:
+        patients = conn.execute(PATIENTS_IN_WINDOW_QUERY, window)
+        buffer = AppointmentColumns().extend(engine.run(patients, report_progress)) if mode == "buffered" else None
+    if buffer is not None:
+        simulated = time.perf_counter()
+        num_appointments = buffer.flush(conn)
+        observe("appointments_flush", time.perf_counter() - simulated)
+    else:
+        appointments = (
+            (pid, staff_id, dept_id, datetime.fromtimestamp(start), duration, status, wait)
+            for pid, staff_id, dept_id, start, duration, status, wait in engine.run(patients, report_progress)
+        )
+        num_appointments = bulk_insert(conn, APPOINTMENT_INSERT, appointments, batch_size)
+    elapsed = time.perf_counter() - started
+    observe("simulation_run", elapsed)
+    inc("scheduling_events", engine.events_processed)
+    inc("appointments_scheduled", num_appointments)
+    with conn:
+        record_appointments(conn, engine.status_counts)
+
+    return {
+        "appointments": num_appointments,
+        "events": engine.events_processed,
+        "events_per_sec": engine.events_processed / elapsed if elapsed > 0 else None,
+        "unserved": engine.unserved,
+        "status_counts": engine.status_counts,
+        "wait_percentiles": engine.wait_stats.percentiles(),
+    }
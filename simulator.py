@@ -0,0 +1,630 @@
+"""
+Simulation state and request handlers shared by both simulator scripts.
+
+EHS_project_02-09-2025_v01.py and EHS_project_02-13-2025_v02.py.py serve the
+same populate / simulate / jobs / sweep / export / report API; it lives here,
+as the `api` blueprint, so a fix is made once. The module settings below are
+bound from config.json by apply_config() and re-bound when the file changes,
+so read them as `simulator.NAME` at call time rather than importing the names.
+"""
+import io
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request
+
+from bulk_load import DEFAULT_BATCH_SIZE, bulk_insert, bulk_load_pragmas, report_throughput
+from connection_manager import DEFAULT_DB_PATH, configure, connection
+from dispatcher import IndexedDispatcher
+from entity_store import StaffStore
+from export import export_stream
+from hospital_config import ConfigError, load_config
+from id_allocator import StaffIdAllocator
+from jobs import JobQueue
+from metrics import inc, timed
+from report_cache import ReportCache, bump_data_version, record_appointments
+from routing import department_router
+from schema import CLINICAL_ROLES, PATIENTS_IN_WINDOW_QUERY, STAFF_ON_SHIFT_QUERY, create_schema, migrate
+from simulation_engine import PROGRESS_EVERY, AppointmentColumns, WaitStats, run_days, run_windows, shift_bounds
+
+CONFIG_PATH = 'config.json'
+
+# Faker is imported and instantiated on first use, so importing this module stays fast.
+_fake = None
+
+
+def get_fake():
+    """Returns the shared Faker instance, creating it on first use."""
+    global _fake
+    if _fake is None:
+        from faker import Faker
+        _fake = Faker()
+    return _fake
+
+
+def apply_config(new_config):
+    """
+    Binds the module settings from a compiled config (see hospital_config), at
+    startup and whenever the file changes. Both staffing formats are accepted.
+    db_path, sweep_output, job_workers and the model settings are only read at startup.
+    """
+    global config, DEPARTMENTS, NUM_PATIENTS, CANCELLATION_RATE, SHIFTS, SHIFT_TIMES, SCHEDULING_POLICY, \
+        TRIAGE_AGING, MATCHING, SIMULATION_MODE, ROUTING_RULES, BATCH_SIZE, PATIENT_GENERATOR, SEED
+    config = new_config
+    DEPARTMENTS = config.departments
+    NUM_PATIENTS = config.num_patients
+    CANCELLATION_RATE = config.cancellation_rate
+    SHIFTS = list(config.shifts)
+    SHIFT_TIMES = config.get('shift_times')
+    SCHEDULING_POLICY = config.get('scheduling_policy', 'fifo')  # 'fifo' or 'triage'
+    TRIAGE_AGING = config.get('triage_aging_per_minute', 0.0)
+    MATCHING = config.get('matching', 'global')  # 'global' or 'department'
+    SIMULATION_MODE = config.get('simulation_mode', 'stream')  # 'stream', 'buffered' or 'memory'
+    ROUTING_RULES = config.get('routing_rules', [])
+    BATCH_SIZE = config.get('batch_size', DEFAULT_BATCH_SIZE)
+    PATIENT_GENERATOR = config.get('patient_generator', 'faker')  # 'faker' or 'vectorized'
+    SEED = config.get('seed', None)
+
+
+def reload_config_if_changed():
+    """Re-binds the settings when config.json has changed; an invalid edit keeps the old settings."""
+    try:
+        latest = load_config(CONFIG_PATH)
+    except (ConfigError, OSError) as e:
+        print(f"Config not reloaded: {e}")
+        return
+    if latest is not config:
+        apply_config(latest)
+        print(f"Reloaded configuration from {CONFIG_PATH}.")
+
+
+# Load and validate the configuration at startup
+apply_config(load_config(CONFIG_PATH))
+DB_PATH = config.get('db_path', DEFAULT_DB_PATH)
+SWEEP_OUTPUT = config.get('sweep_output', 'sweep_results.npz')
+JOB_WORKERS = config.get('job_workers', 2)
+
+# Staff IDs ({PREFIX}700{n}) come from per-prefix sequences in the database, so they
+# stay unique across threads, processes, restarts and repeated /populate calls.
+staff_ids = StaffIdAllocator()
+
+
+def generate_staff_id(role):
+    """
+    Generates a custom staff ID based on the role.
+    The ID follows the pattern: {PREFIX}700{counter}
+    e.g., first Doctor -> MD7001, first Registered Nurse -> RN7001, etc.
+    Prefixes are listed in id_allocator.STAFF_ID_PREFIXES.
+    """
+    return staff_ids.next_id(role)
+
+
+def create_db():
+    """
+    Drops and recreates every table, then applies all schema migrations
+    (including the indexes the simulation's hot queries rely on).
+    """
+    with connection() as conn:
+        create_schema(conn)
+    print("Database and tables created from scratch.")
+
+
+def generate_staff_rows(department_ids):
+    """
+    Lazily yields one staff row per clinician for every department in `department_ids`.
+    For clinical departments, a random shift is assigned from the SHIFTS list.
+    For non-clinical departments, a default shift "day" is assigned.
+    """
+    fake = get_fake()
+    for dept in DEPARTMENTS:
+        dept_id = department_ids[dept.name]
+        for staffing in dept.staffing:
+            num_staff = random.randint(staffing.min, staffing.max)
+            # One sequence reservation per role and department, not one per row.
+            for staff_id in staff_ids.reserve_ids(staffing.role, num_staff):
+                staff_name = fake.name()
+                # For clinical departments, assign a random shift from SHIFTS; otherwise, default to "day".
+                assigned_shift = random.choice(SHIFTS) if dept.is_clinical else "day"
+                yield staff_id, staff_name, staffing.role, dept_id, 'available', assigned_shift
+
+
+@timed("populate_departments_and_staff")
+def populate_departments_and_staff(batch_size=None):
+    """
+    Inserts departments and populates each with staff.
+    Staff rows are generated lazily and inserted with executemany in chunks of
+    `batch_size` (default: the configured batch_size), one transaction per chunk,
+    with bulk-load pragmas applied.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    with connection() as conn:
+        cursor = conn.cursor()
+        started = time.perf_counter()
+
+        department_ids = {}  # Map department name to its ID
+
+        with bulk_load_pragmas(conn):
+            for dept in DEPARTMENTS:
+                cursor.execute(
+                    "INSERT INTO departments (name, capacity, is_clinical) VALUES (?, ?, ?)",
+                    (dept.name, dept.capacity, int(dept.is_clinical))
+                )
+                department_ids[dept.name] = cursor.lastrowid
+            conn.commit()
+
+            num_staff = bulk_insert(
+                conn,
+                "INSERT INTO staff (id, name, role, department_id, availability, shift) VALUES (?, ?, ?, ?, ?, ?)",
+                generate_staff_rows(department_ids),
+                batch_size
+            )
+            bump_data_version(conn)
+    print("Departments and staff data populated successfully.")
+    report_throughput("Staff load", len(department_ids) + num_staff, started)
+    return department_ids
+
+
+def generate_patient_rows(num_patients):
+    """
+    Lazily yields realistic patient rows.
+    Each patient gets:
+      - A name, date of birth, and gender.
+      - A triage level (1–5) where 5 is most urgent.
+      - An arrival time randomly assigned within the hour before generation started,
+        stored as integer epoch seconds.
+    """
+    fake = get_fake()
+    now = datetime.now()
+    for _ in range(num_patients):
+        name = fake.name()
+        dob = fake.date_of_birth(minimum_age=0, maximum_age=99)
+        gender = random.choice(['Male', 'Female'])
+        triage_level = random.randint(1, 5)
+        arrival_time = int((now - timedelta(minutes=random.randint(0, 60))).timestamp())
+        yield name, dob, gender, triage_level, arrival_time
+
+
+@timed("populate_patients")
+def populate_patients(num_patients=None, batch_size=None, generator=None, seed=None):
+    """
+    Populates the patients table with realistic data, inserted with executemany
+    in chunks of `batch_size`, one transaction per chunk.
+    With generator='vectorized', rows are drawn as NumPy arrays from a seeded
+    generator and a pre-sampled name pool instead of per-row Faker calls.
+    Arguments left as None take the current configured values.
+    """
+    num_patients = NUM_PATIENTS if num_patients is None else num_patients
+    batch_size = batch_size or BATCH_SIZE
+    generator = generator or PATIENT_GENERATOR
+    seed = SEED if seed is None else seed
+    with connection() as conn:
+        started = time.perf_counter()
+
+        if generator == 'vectorized':
+            from patient_generator import generate_patient_rows_vectorized
+            rows = generate_patient_rows_vectorized(num_patients, seed=seed, batch_size=batch_size)
+        else:
+            rows = generate_patient_rows(num_patients)
+
+        with bulk_load_pragmas(conn):
+            patient_ids = bulk_insert(
+                conn,
+                "INSERT INTO patients (name, dob, gender, triage_level, arrival_time) VALUES (?, ?, ?, ?, ?)",
+                rows,
+                batch_size,
+                collect_rowids=True
+            )
+            bump_data_version(conn)
+    print("Patients data populated successfully.")
+    report_throughput("Patient load", len(patient_ids), started)
+    return patient_ids
+
+
+def simulation_settings(policy, aging_per_minute, matching, mode):
+    """
+    Fills in the arguments left as None from the current config. Read at call
+    time, not as default values, so a reloaded config.json takes effect.
+    """
+    return (SCHEDULING_POLICY if policy is None else policy,
+            TRIAGE_AGING if aging_per_minute is None else aging_per_minute,
+            MATCHING if matching is None else matching,
+            SIMULATION_MODE if mode is None else mode)
+
+
+@timed("simulate_shift")
+def simulate_shift(shift="Day", shift_start_str=None, shift_end_str=None, dispatcher_cls=IndexedDispatcher,
+                   policy=None, aging_per_minute=None, matching=None, mode=None, report_progress=None):
+    """
+    Simulates one shift (e.g., Day) of hospital operations:
+      - Only clinical staff on the given shift are used for appointments.
+      - Each staff member is assigned a 'next available time', initialized to the shift start.
+        The staff are held in a dispatcher (a priority queue by default) so the earliest
+        free clinician is found in O(log S) rather than by sorting every staff member.
+      - Patients arriving during the shift are scheduled in order.
+      - Appointment start time = max(patient arrival, staff's available time).
+      - With a small probability, an appointment is cancelled.
+      - Each appointment records the patient's wait (start - arrival) in minutes.
+    With policy='triage', waiting patients are instead seen by triage level (then arrival,
+    with optional aging) using the discrete-event engine over this one shift. The engine is
+    also used with matching='department', where each patient is routed to a department and
+    seen only by that department's clinicians, within its bed capacity, and with
+    mode='memory' (see simulation_engine.SIMULATION_MODES).
+    Appointments are collected in memory and written in one batch after scheduling.
+    report_progress(fraction), if given, is told periodically how far through the shift the run is.
+    Returns per-triage-level p50/p95/p99 wait times of the patients seen, with the number
+    of patients of each level who were not seen before the shift ended ("unserved").
+    """
+    policy, aging_per_minute, matching, mode = simulation_settings(policy, aging_per_minute, matching, mode)
+    # Use shift times from the config if not provided.
+    if not shift_start_str or not shift_end_str:
+        times = SHIFT_TIMES.get(shift, {"start": "07:00", "end": "19:00"})
+        shift_start_str = times["start"]
+        shift_end_str = times["end"]
+
+    # Define shift start and end times for today (a shift crossing midnight ends tomorrow).
+    shift_start, shift_end = shift_bounds(datetime.now().date(), shift_start_str, shift_end_str)
+
+    if policy != 'fifo' or matching != 'global' or mode == 'memory':
+        window = (shift, int(shift_start.timestamp()), int(shift_end.timestamp()))
+        with connection() as conn:
+            router, capacities = build_router(conn, matching)
+            summary = run_windows(conn, [window], CANCELLATION_RATE, policy=policy,
+                                  aging_per_minute=aging_per_minute, router=router, capacities=capacities,
+                                  mode=mode, report_progress=report_progress)
+        print(f"Shift simulation complete: {summary['appointments']} appointments scheduled for the {shift} shift.")
+        return summary['wait_percentiles']
+
+    with connection() as conn:
+        cursor = conn.cursor()
+
+        # Retrieve clinical staff (roles eligible for patient appointments) on the specified shift.
+        cursor.execute(STAFF_ON_SHIFT_QUERY, (*CLINICAL_ROLES, shift))
+        staff_data = cursor.fetchall()
+        if not staff_data:
+            print("No clinical staff available for shift:", shift)
+            return {}
+
+        # Staff are dense indexes into array columns; times are integer epoch seconds.
+        staff = StaffStore(staff_data)
+        shift_start_epoch, shift_end_epoch = int(shift_start.timestamp()), int(shift_end.timestamp())
+
+        # Initialize each staff's next available time to the shift start.
+        dispatcher = dispatcher_cls(range(len(staff)), shift_start_epoch)
+
+        # Stream the patients who arrived during the shift, already sorted by arrival time.
+        # The window filter and ORDER BY run in SQL on the arrival_time index.
+        patients = conn.execute(PATIENTS_IN_WINDOW_QUERY, (shift_start_epoch, shift_end_epoch))
+
+        cancellation_rate = CANCELLATION_RATE  # Use the config value
+        appointments = AppointmentColumns()
+        status_counts = {}
+        wait_stats = WaitStats()
+
+        shift_length = max(1, shift_end_epoch - shift_start_epoch)
+        for count, (pid, triage, arrival) in enumerate(patients, 1):
+            if report_progress and count % PROGRESS_EVERY == 0:
+                report_progress((arrival - shift_start_epoch) / shift_length)
+
+            # Find the clinical staff with the earliest next available time.
+            earliest = dispatcher.peek()
+            if earliest is None:
+                break
+            index, available_time = earliest
+            # The appointment start time is the later of the patient's arrival and the staff's availability.
+            appointment_start = max(arrival, available_time)
+            if appointment_start > shift_end_epoch:
+                wait_stats.add_unserved(triage)
+                continue  # Cannot schedule if beyond the shift end.
+            duration = random.randint(15, 45)  # Appointment duration in minutes.
+
+            # Decide if the appointment is cancelled.
+            if random.random() < cancellation_rate:
+                status = "cancelled"
+            else:
+                status = "completed"
+                # Update the staff's next available time.
+                dispatcher.update(index, appointment_start + duration * 60)
+
+            wait_minutes = (appointment_start - arrival) / 60
+            wait_stats.add(triage, wait_minutes)
+
+            # Buffer the appointment; nothing is written while scheduling.
+            appointments.append(pid, staff.ids[index], staff.department[index], appointment_start, duration, status,
+                                wait_minutes)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+        # Write every appointment of the shift in one executemany.
+        appointments_scheduled = appointments.flush(conn)
+        inc("appointments_scheduled", appointments_scheduled)
+        # Keep the report summary current and invalidate cached reports.
+        record_appointments(conn, status_counts)
+    print(f"Shift simulation complete: {appointments_scheduled} appointments scheduled for the {shift} shift.")
+    return wait_stats.percentiles()
+
+
+def build_router(conn, matching):
+    """
+    Returns (router, capacities) for the engine: with matching='department', a rule-table
+    router (ROUTING_RULES, then capacity-weighted) and each department's bed capacity;
+    with matching='global', (None, None) so any clinician can see any patient.
+    """
+    if matching == 'department':
+        return department_router(conn, ROUTING_RULES, SEED)
+    return None, None
+
+
+@timed("simulate_days")
+def simulate_days(num_days=1, start_date=None, policy=None, aging_per_minute=None, matching=None, mode=None,
+                  report_progress=None):
+    """
+    Simulates `num_days` consecutive days of every shift in SHIFTS / SHIFT_TIMES in one
+    run of the discrete-event engine. Clinicians and waiting patients carry over from
+    one shift to the next, so this replaces chaining one /simulate call per shift.
+    """
+    policy, aging_per_minute, matching, mode = simulation_settings(policy, aging_per_minute, matching, mode)
+    with connection() as conn:
+        router, capacities = build_router(conn, matching)
+        summary = run_days(conn, SHIFTS, SHIFT_TIMES, num_days, start_date, CANCELLATION_RATE,
+                           batch_size=BATCH_SIZE, policy=policy, aging_per_minute=aging_per_minute,
+                           router=router, capacities=capacities, mode=mode, report_progress=report_progress)
+    print(f"Simulation complete: {summary['appointments']} appointments over {num_days} day(s), "
+          f"{summary['unserved']} patients still waiting.")
+    return summary
+
+
+def render_status_chart(status_counts):
+    """
+    Visualizes the distribution of appointment statuses (e.g., completed, cancelled)
+    using a pie chart and returns the image as PNG bytes.
+    """
+    print("Appointment Status Counts:", status_counts)
+
+    # Create a pie chart for visualization
+    labels = list(status_counts.keys())
+    sizes = list(status_counts.values())
+
+    # The chart backend is only loaded when a report is rendered; Agg needs no display
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(6, 6))
+    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
+    plt.title("Appointment Status Distribution")
+    plt.axis('equal')
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    chart_png = buf.getvalue()
+    buf.close()
+    plt.close()
+    return chart_png
+
+
+# Rendered reports are cached per data version.
+report_cache = ReportCache(render_status_chart)
+
+
+def get_cached_report():
+    """
+    Returns the current report. Status counts come from the incrementally maintained
+    summary table and the chart is only re-rendered when the data version changes.
+    """
+    with connection() as conn:
+        return report_cache.get(conn)
+
+
+def generate_report():
+    """
+    Returns the appointment status counts and the pie chart image as a base64 encoded string.
+    """
+    report = get_cached_report()
+    return report.status_counts, report.chart_base64
+
+
+def run_populate(data, report_progress=None):
+    """Populates departments, staff and patients from a /populate request body."""
+    department_ids = populate_departments_and_staff(BATCH_SIZE)
+    if report_progress:
+        report_progress(0.5)
+    patient_ids = populate_patients(
+        int(data.get('num_patients', NUM_PATIENTS)),
+        BATCH_SIZE,
+        generator=data.get('generator', PATIENT_GENERATOR),
+        seed=data.get('seed', SEED)
+    )
+    return {
+        "message": "Database populated.",
+        "departments": department_ids,
+        "num_patients": len(patient_ids)
+    }
+
+
+def run_simulate(data, report_progress=None):
+    """Runs a shift (or, with 'days', a multi-day) simulation from a /simulate request body."""
+    policy = data.get('policy', SCHEDULING_POLICY)
+    aging_per_minute = float(data.get('aging_per_minute', TRIAGE_AGING))
+    matching = data.get('matching', MATCHING)
+    mode = data.get('mode', SIMULATION_MODE)
+    if 'days' in data:
+        summary = simulate_days(int(data['days']), policy=policy, aging_per_minute=aging_per_minute,
+                                matching=matching, mode=mode, report_progress=report_progress)
+        return {"message": f"Simulation completed for {data['days']} day(s).", "summary": summary}
+    shift = data.get('shift', 'Day')
+    shift_start_str = data.get('shift_start', None)
+    shift_end_str = data.get('shift_end', None)
+    wait_percentiles = simulate_shift(shift, shift_start_str, shift_end_str, policy=policy,
+                                      aging_per_minute=aging_per_minute, matching=matching, mode=mode,
+                                      report_progress=report_progress)
+    return {
+        "message": f"Shift simulation completed for shift {shift}.",
+        "wait_percentiles": wait_percentiles
+    }
+
+
+def sweep_settings(data):
+    """sweep() keyword arguments from a /sweep request body."""
+    return {
+        "mode": data.get('mode', 'lhs'),
+        "samples": int(data.get('samples', 20)),
+        "levels": int(data.get('levels', 3)),
+        "num_patients_range": data.get('num_patients'),
+        "cancellation_rate_range": data.get('cancellation_rate'),
+        "vary": data.get('vary', ['staffing']),
+        "seed": int(data.get('seed', 0)),
+    }
+
+
+def run_sweep(data, report_progress=None):
+    """Runs a parameter sweep from a /sweep request body and saves it to SWEEP_OUTPUT."""
+    from sweep import sweep  # NumPy is only loaded for sweeps
+    stats = sweep(config, replications=int(data.get('replications', 5)), num_days=int(data.get('days', 1)),
+                  output=SWEEP_OUTPUT, **sweep_settings(data))
+    return {"message": "Parameter sweep completed.", "results": stats}
+
+
+# Requests sent with {"async": true} (and every sweep) run here; the response carries
+# the job id, and /jobs/<id> reports status and progress. Jobs live in the jobs table.
+job_queue = JobQueue({'populate': run_populate, 'simulate': run_simulate, 'sweep': run_sweep},
+                     max_workers=JOB_WORKERS)
+
+_started = False
+_startup_lock = threading.Lock()
+
+
+def startup():
+    """
+    Server startup: points the connection pool at DB_PATH, brings the database
+    up to the current schema and resumes the background jobs left queued by a
+    previous run. Runs once, from each script's __main__ or before the first
+    request. Importing the module touches no database, so tests and tools that
+    import it neither migrate nor start jobs; code that calls the simulation
+    functions directly calls startup() first.
+    """
+    global _started
+    if _started:
+        return
+    with _startup_lock:
+        if _started:
+            return
+        # All database access borrows pooled connections to DB_PATH.
+        configure(DB_PATH)
+        # Bring an existing database up to the current schema (e.g. add missing indexes).
+        with connection() as conn:
+            migrate(conn)
+        job_queue.recover()
+        _started = True
+
+
+def job_accepted(job_id):
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}",
+                    "result_url": f"/jobs/{job_id}/result"}), 202
+
+
+def cached_response(body, etag, mimetype, status=200):
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# The endpoints both simulators serve; each script registers this on its Flask app.
+api = Blueprint('simulator', __name__)
+api.before_app_request(startup)
+# Pick up config.json edits without a restart (one stat() per request).
+api.before_app_request(reload_config_if_changed)
+
+
+@api.route('/create_db', methods=['POST'])
+def api_create_db():
+    create_db()
+    return jsonify({"message": "Database created from scratch."}), 200
+
+
+@api.route('/populate', methods=['POST'])
+def api_populate():
+    data = request.get_json(silent=True) or {}
+    if data.get('async'):
+        return job_accepted(job_queue.submit('populate', data))
+    return jsonify(run_populate(data)), 200
+
+
+@api.route('/simulate', methods=['POST'])
+def api_simulate():
+    data = request.get_json() or {}
+    if data.get('async'):
+        return job_accepted(job_queue.submit('simulate', data))
+    return jsonify(run_simulate(data)), 200
+
+
+@api.route('/jobs', methods=['GET'])
+def api_jobs():
+    return jsonify({"jobs": job_queue.list(int(request.args.get('limit', 50)))}), 200
+
+
+@api.route('/jobs/<int:job_id>', methods=['GET'])
+def api_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"No job {job_id}."}), 404
+    job.pop('result')
+    return jsonify(job), 200
+
+
+@api.route('/jobs/<int:job_id>/result', methods=['GET'])
+def api_job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"No job {job_id}."}), 404
+    if job['status'] == 'failed':
+        return jsonify({"status": job['status'], "error": job['error']}), 500
+    if job['status'] != 'succeeded':
+        return jsonify({"status": job['status'], "progress": job['progress']}), 409
+    return jsonify(job['result']), 200
+
+
+@api.route('/sweep', methods=['POST'])
+def api_sweep():
+    """Queues a sweep after checking it is within sweep.MAX_POINTS; 400 otherwise."""
+    from sweep import sweep_points
+    data = request.get_json() or {}
+    try:
+        sweep_points(config, **sweep_settings(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return job_accepted(job_queue.submit('sweep', data))
+
+
+@api.route('/export/<table>', methods=['GET'])
+def api_export(table):
+    """
+    Streams appointments, patients or staff as ndjson (default), csv, arrow or parquet.
+    Filters: shift, department (id or name), start / end (ISO datetimes).
+    """
+    args = request.args
+    fmt = args.get('format', 'ndjson')
+    try:
+        mimetype, chunks = export_stream(table, fmt, shift=args.get('shift'), department=args.get('department'),
+                                         start=args.get('start'), end=args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = current_app.response_class(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{table}.{fmt}"'
+    return response
+
+
+@api.route('/report', methods=['GET'])
+def api_report():
+    report = get_cached_report()
+    if request.if_none_match.contains(report.etag):
+        return cached_response(b"", report.etag, 'application/json', 304)
+    return cached_response(report.json_body, report.etag, 'application/json')
+
+
+@api.route('/report/chart.png', methods=['GET'])
+def api_report_chart():
+    report = get_cached_report()
+    if request.if_none_match.contains(report.etag):
+        return cached_response(b"", report.etag, 'image/png', 304)
+    return cached_response(report.chart_png, report.etag, 'image/png')
@@ -0,0 +1,193 @@
+import argparse
+import itertools
+import json
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from hospital_config import load_config
+from replications import METRICS, replication_params, run_parallel
+from schema import CLINICAL_ROLES
+
+Dimension = namedtuple("Dimension", "name low high is_int")
+
+STAFFING_PREFIX = "staffing:"
+
+# Largest sweep accepted, in points. A grid over every staffing range grows as
+# levels ** dimensions (25 clinical dimensions at 3 levels is ~1.5e10 points),
+# so oversized sweeps are refused before any point is built.
+MAX_POINTS = 10000
+
+# Results of previously simulated points, keyed by the full replication
+# parameters and settings, so repeated or overlapping sweeps only simulate what
+# is new and a changed config is never answered from the cache.
+_result_cache = {}
+
+
+def staffing_dimension_name(department, role):
+    return f"{STAFFING_PREFIX}{department}:{role}"
+
+
+def build_space(config, num_patients_range=None, cancellation_rate_range=None, vary=("staffing",)):
+    """
+    Builds the sweep dimensions from a config: every clinical role's staffing
+    min/max range (when "staffing" is in `vary`), plus optional ranges for
+    num_patients and cancellation_rate.
+    """
+    space = []
+    if "staffing" in vary:
+        for dept in config.get("departments_info", []):
+            if not dept.get("is_clinical", False):
+                continue
+            for role, value in dept.get("staffing", {}).items():
+                if role in CLINICAL_ROLES:
+                    space.append(Dimension(staffing_dimension_name(dept["name"], role), value["min"], value["max"],
+                                           True))
+    if num_patients_range:
+        space.append(Dimension("num_patients", num_patients_range[0], num_patients_range[1], True))
+    if cancellation_rate_range:
+        space.append(Dimension("cancellation_rate", cancellation_rate_range[0], cancellation_rate_range[1], False))
+    return space
+
+
+def _as_value(dimension, value):
+    return int(round(value)) if dimension.is_int else float(value)
+
+
+def grid_points(space, levels):
+    """
+    Full factorial grid with `levels` evenly spaced values per dimension
+    (duplicates removed). Raises ValueError if it would exceed MAX_POINTS.
+    """
+    axes = []
+    for dimension in space:
+        values = np.linspace(dimension.low, dimension.high, levels)
+        axes.append(sorted({_as_value(dimension, value) for value in values}))
+    size = math.prod(len(axis) for axis in axes)
+    if size > MAX_POINTS:
+        raise ValueError(f"A grid over {len(space)} dimensions at {levels} levels has {size} points, more than "
+                         f"{MAX_POINTS}; vary fewer dimensions, lower 'levels' or use mode 'lhs'.")
+    return [dict(zip((d.name for d in space), combo)) for combo in itertools.product(*axes)]
+
+
+def latin_hypercube_points(space, samples, seed=None):
+    """`samples` points from a Latin hypercube: each dimension's range is hit once per stratum."""
+    if samples > MAX_POINTS:
+        raise ValueError(f"{samples} samples is more than {MAX_POINTS}.")
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(samples)]
+    for dimension in space:
+        strata = (rng.permutation(samples) + rng.random(samples)) / samples
+        values = dimension.low + strata * (dimension.high - dimension.low)
+        for point, value in zip(points, values):
+            point[dimension.name] = _as_value(dimension, value)
+    return points
+
+
+def point_params(config, point, num_days):
+    """Turns a sweep point into replication parameters (without a seed)."""
+    overrides = {}
+    for name, value in point.items():
+        if name.startswith(STAFFING_PREFIX):
+            department, role = name[len(STAFFING_PREFIX):].split(":", 1)
+            overrides[(department, role)] = value
+    return replication_params(config, num_days, point.get("cancellation_rate"), point.get("num_patients"),
+                              overrides)
+
+
+def cache_key(params, replications, base_seed):
+    """JSON key over everything a point's replications depend on."""
+    overrides = params["staffing_overrides"] or {}
+    params = dict(params, staffing_overrides=sorted([department, role, count]
+                                                    for (department, role), count in overrides.items()))
+    return json.dumps({"params": params, "replications": replications, "base_seed": base_seed}, sort_keys=True)
+
+
+def run_sweep(config, points, replications=5, num_days=1, base_seed=0, max_workers=None):
+    """
+    Simulates every point (`replications` seeded runs each, all in parallel),
+    reusing cached results for identical points. Returns (columns, stats) where
+    columns is a dict of equal-length NumPy arrays: one per swept dimension, then
+    <metric>_mean / <metric>_std for every metric.
+    """
+    point_params_list = [point_params(config, point, num_days) for point in points]
+    keys = [cache_key(params, replications, base_seed) for params in point_params_list]
+    pending = {}
+    for key, params in zip(keys, point_params_list):
+        if key not in _result_cache and key not in pending:
+            pending[key] = params
+
+    jobs = []
+    for key, params in pending.items():
+        jobs.extend((key, dict(params, seed=base_seed + i)) for i in range(replications))
+    if jobs:
+        results = run_parallel([params for _, params in jobs], max_workers)
+        grouped = {}
+        for (key, _), result in zip(jobs, results):
+            grouped.setdefault(key, []).append(result)
+        for key, runs in grouped.items():
+            _result_cache[key] = {
+                metric: (float(np.mean([run[metric] for run in runs])), float(np.std([run[metric] for run in runs])))
+                for metric in METRICS
+            }
+
+    names = sorted({name for point in points for name in point})
+    columns = {name: np.array([point.get(name, np.nan) for point in points], dtype=np.float64) for name in names}
+    for metric in METRICS:
+        columns[f"{metric}_mean"] = np.array([_result_cache[key][metric][0] for key in keys])
+        columns[f"{metric}_std"] = np.array([_result_cache[key][metric][1] for key in keys])
+    stats = {"points": len(points), "unique_points": len(set(keys)), "simulated_points": len(pending),
+             "replications": len(jobs)}
+    return columns, stats
+
+
+def save_results(columns, path):
+    """Writes the results table as a compressed .npz (one array per column, plus the column order)."""
+    np.savez_compressed(path, columns=np.array(list(columns)), **columns)
+    return path
+
+
+def sweep_points(config, mode="lhs", samples=20, levels=3, num_patients_range=None, cancellation_rate_range=None,
+                 vary=("staffing",), seed=0):
+    """Builds the parameter space and samples it (grid or Latin hypercube); ValueError if it is too large."""
+    space = build_space(config, num_patients_range, cancellation_rate_range, vary)
+    if mode == "grid":
+        return grid_points(space, levels)
+    return latin_hypercube_points(space, samples, seed)
+
+
+def sweep(config, mode="lhs", samples=20, levels=3, num_patients_range=None, cancellation_rate_range=None,
+          vary=("staffing",), replications=5, num_days=1, seed=0, output="sweep_results.npz", max_workers=None):
+    """Samples the parameter space (see sweep_points), runs every point and saves the table."""
+    points = sweep_points(config, mode, samples, levels, num_patients_range, cancellation_rate_range, vary, seed)
+    columns, stats = run_sweep(config, points, replications, num_days, seed, max_workers)
+    save_results(columns, output)
+    stats["output"] = output
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep staffing, patient volume and cancellation rate.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--mode", choices=("grid", "lhs"), default="lhs")
+    parser.add_argument("--samples", type=int, default=20, help="points for --mode lhs")
+    parser.add_argument("--levels", type=int, default=3, help="values per dimension for --mode grid")
+    parser.add_argument("--num-patients", type=int, nargs=2, metavar=("LOW", "HIGH"))
+    parser.add_argument("--cancellation-rate", type=float, nargs=2, metavar=("LOW", "HIGH"))
+    parser.add_argument("--no-staffing", action="store_true", help="keep staffing sampled, not swept")
+    parser.add_argument("--replications", type=int, default=5)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.npz")
+    args = parser.parse_args()
+
+    loaded_config = load_config(args.config)
+    try:
+        summary = sweep(loaded_config, args.mode, args.samples, args.levels, args.num_patients,
+                        args.cancellation_rate, () if args.no_staffing else ("staffing",), args.replications,
+                        args.days, args.seed, args.output, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(summary, indent=2))
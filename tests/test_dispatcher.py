@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from dispatcher import IndexedDispatcher
+
+
+def earliest(next_available, order):
+    """The clinician the old scheduler took: a stable sort of the staff (in `order`) by available time."""
+    available_staff = sorted(((i, next_available[i]) for i in order if i in next_available), key=lambda x: x[1])
+    return available_staff[0] if available_staff else None
+
+
+def test_ties_go_to_staff_order():
+    dispatcher = IndexedDispatcher([2, 0, 1], 100)
+    assert dispatcher.pop() == (2, 100)
+    assert dispatcher.pop() == (0, 100)
+    assert dispatcher.pop() == (1, 100)
+    assert dispatcher.peek() is None
+
+
+def test_update_of_a_clinician_below_the_top():
+    dispatcher = IndexedDispatcher(range(4), 100)
+    dispatcher.update(3, 50)
+    assert dispatcher.peek() == (3, 50)
+    dispatcher.update(3, 200)
+    assert dispatcher.peek() == (0, 100)
+    assert dispatcher.next_available(3) == 200
+    assert len(dispatcher) == 4
+
+
+def test_popped_clinician_keeps_their_tie_order_when_pushed_back():
+    dispatcher = IndexedDispatcher(range(3), 100)
+    assert dispatcher.pop() == (0, 100)
+    dispatcher.push(0, 100)
+    assert dispatcher.peek() == (0, 100)
+    dispatcher.remove(0)
+    assert 0 not in dispatcher
+    assert dispatcher.pop() == (1, 100)
+
+
+def test_empty_dispatcher():
+    dispatcher = IndexedDispatcher([], 0)
+    assert dispatcher.peek() is None
+    with pytest.raises(IndexError):
+        dispatcher.pop()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_sorting_every_clinician(seed):
+    rng = random.Random(seed)
+    staff = rng.sample(range(40), rng.randint(1, 30))
+    dispatcher = IndexedDispatcher(staff, 0)
+    next_available = {index: 0 for index in staff}
+    order = list(staff)
+    popped = []
+    for _ in range(2000):
+        # A handful of distinct times keeps ties common
+        at = rng.randrange(0, 10) * 60
+        operation = rng.random()
+        if operation < 0.4 and next_available:
+            index = dispatcher.peek()[0]
+            dispatcher.update(index, at)
+            next_available[index] = at
+        elif operation < 0.6 and next_available:
+            index = rng.choice(list(next_available))
+            dispatcher.update(index, at)
+            next_available[index] = at
+        elif operation < 0.75 and next_available:
+            entry = dispatcher.pop()
+            assert entry == earliest(next_available, order)
+            del next_available[entry[0]]
+            popped.append(entry[0])
+        elif operation < 0.9 and popped:
+            index = popped.pop(rng.randrange(len(popped)))
+            dispatcher.push(index, at)
+            next_available[index] = at
+        elif next_available:
+            index = rng.choice(list(next_available))
+            dispatcher.remove(index)
+            del next_available[index]
+            popped.append(index)
+        assert dispatcher.peek() == earliest(next_available, order)
+        assert len(dispatcher) == len(next_available)
+        for index, available in next_available.items():
+            assert dispatcher.next_available(index) == available
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from connection_manager import configure, connection, get_manager
+from id_allocator import StaffIdAllocator, staff_id_prefix
+from schema import create_schema, migrate
+
+ROLES = ("Doctor", "Pharmacist", "Physical Therapist")
+
+
+@pytest.fixture
+def database(tmp_path):
+    configure(str(tmp_path / "ids.db"))
+    with connection() as conn:
+        migrate(conn)
+    yield
+    get_manager().close_all()
+
+
+def allocate(allocator, count):
+    """IDs from both reserve_ids and next_id, for every role."""
+    ids = []
+    for role in ROLES:
+        for _ in range(count):
+            ids.extend(allocator.reserve_ids(role, 3))
+            ids.append(allocator.next_id(role))
+    return ids
+
+
+def test_prefixes():
+    assert staff_id_prefix("Pharmacist") == "PH"
+    assert staff_id_prefix("Physical Therapist") == "PHT"
+    assert staff_id_prefix("Pharmacy Technician") == "PT"
+    assert staff_id_prefix("Chief Surgeon") == "CS"
+    assert staff_id_prefix("Surgeon") == "SU"
+
+
+def test_allocators_sharing_a_database_never_repeat_an_id(database):
+    first, second = StaffIdAllocator(block_size=5), StaffIdAllocator(block_size=5)
+    results = [[], []]
+
+    def run(allocator, out):
+        out.extend(allocate(allocator, 20))
+
+    threads = [threading.Thread(target=run, args=(first, results[0])),
+               threading.Thread(target=run, args=(second, results[1]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = results[0] + results[1]
+    assert len(ids) == 2 * len(ROLES) * 20 * 4
+    assert len(set(ids)) == len(ids)
+    assert {staff_id[:3] for staff_id in ids if staff_id.startswith("PH")} == {"PH7", "PHT"}
+
+    # A restart: new allocators, and the blocks the old ones still held are skipped
+    restarted = allocate(StaffIdAllocator(block_size=5), 5)
+    assert not set(restarted) & set(ids)
+
+    # A second populate: /create_db rebuilds the staff table but keeps the sequences
+    with connection() as conn:
+        create_schema(conn)
+    repopulated = allocate(StaffIdAllocator(block_size=5), 5)
+    assert not set(repopulated) & (set(ids) | set(restarted))
+
+
+def test_new_sequence_starts_after_existing_staff(database):
+    with connection() as conn:
+        with conn:
+            conn.execute("INSERT INTO staff (id, name, role) VALUES ('PH7004', 'Existing', 'Pharmacist')")
+    allocator = StaffIdAllocator()
+    assert allocator.reserve_ids("Pharmacist", 2) == ["PH7005", "PH7006"]
+    assert allocator.next_id("Physical Therapist") == "PHT7001"
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import importtime  # noqa: E402
+
+
+@pytest.mark.parametrize("variant", sorted(importtime.SIMULATORS))
+def test_simulator_import_is_within_budget(variant):
+    result = importtime.check(variant, importtime.DEFAULT_BUDGET_MS, top=10)
+    assert result["problems"] == []
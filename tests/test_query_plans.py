@@ -0,0 +1,10 @@
+import sqlite3
+
+from schema import HOT_QUERIES, check_query_plans, create_schema
+
+
+def test_hot_queries_use_their_indexes():
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    assert HOT_QUERIES
+    assert check_query_plans(conn) == {}
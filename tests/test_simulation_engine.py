@@ -0,0 +1,84 @@
+import random
+import sqlite3
+from datetime import date, datetime
+
+from schema import create_schema
+from simulation_engine import SimulationEngine, run_windows, shift_bounds, shift_windows
+
+DAY = date(2025, 1, 1)
+SHIFT_TIMES = {"Day": {"start": "07:00", "end": "19:00"}, "Night": {"start": "19:00", "end": "07:00"}}
+
+
+def epoch(day, hour, minute=0):
+    return int(datetime(day.year, day.month, day.day, hour, minute).timestamp())
+
+
+def database(staff, patients):
+    """In-memory database with one clinical department; staff are (id, shift), patients (triage, arrival)."""
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    with conn:
+        conn.execute("INSERT INTO departments (id, name, capacity, is_clinical) VALUES (1, 'Emergency', 10, 1)")
+        conn.executemany("INSERT INTO staff (id, name, role, department_id, shift) VALUES (?, ?, 'Doctor', 1, ?)",
+                         [(staff_id, staff_id, shift) for staff_id, shift in staff])
+        conn.executemany("INSERT INTO patients (id, name, triage_level, arrival_time) VALUES (?, 'Patient', ?, ?)",
+                         [(pid, triage, arrival) for pid, (triage, arrival) in enumerate(patients, 1)])
+    return conn
+
+
+def appointments(conn):
+    """{patient_id: (staff_id, start datetime)} of what was written."""
+    rows = conn.execute("SELECT patient_id, staff_id, scheduled_time FROM appointments").fetchall()
+    return {pid: (staff_id, datetime.fromisoformat(str(start))) for pid, staff_id, start in rows}
+
+
+def test_night_shift_ends_the_next_morning():
+    assert shift_bounds(DAY, "19:00", "07:00") == (datetime(2025, 1, 1, 19), datetime(2025, 1, 2, 7))
+    assert shift_bounds(DAY, "07:00", "19:00") == (datetime(2025, 1, 1, 7), datetime(2025, 1, 1, 19))
+    windows = shift_windows(["Night", "Day"], SHIFT_TIMES, DAY, 2)
+    assert windows == [
+        ("Day", epoch(DAY, 7), epoch(DAY, 19)),
+        ("Night", epoch(DAY, 19), epoch(date(2025, 1, 2), 7)),
+        ("Day", epoch(date(2025, 1, 2), 7), epoch(date(2025, 1, 2), 19)),
+        ("Night", epoch(date(2025, 1, 2), 19), epoch(date(2025, 1, 3), 7)),
+    ]
+
+
+def test_night_shift_sees_patients_after_midnight():
+    after_midnight = epoch(date(2025, 1, 2), 2)
+    conn = database([("N1", "Night")], [(3, after_midnight)])
+    summary = run_windows(conn, shift_windows(["Night"], SHIFT_TIMES, DAY, 1), cancellation_rate=0,
+                          rng=random.Random(0), mode="buffered")
+    assert summary["appointments"] == 1
+    assert summary["unserved"] == 0
+    assert appointments(conn) == {1: ("N1", datetime(2025, 1, 2, 2))}
+
+
+def test_waiting_patients_and_busy_clinicians_carry_over_between_shifts():
+    conn = database([("D1", "Day"), ("N1", "Night")],
+                    [(3, epoch(DAY, 18, 50)), (3, epoch(DAY, 18, 55)), (3, epoch(DAY, 19, 1))])
+    summary = run_windows(conn, shift_windows(["Day", "Night"], SHIFT_TIMES, DAY, 1), cancellation_rate=0,
+                          rng=random.Random(0), mode="stream")
+    seen = appointments(conn)
+    assert summary["appointments"] == 3
+    # D1 is still busy at 19:00, so the 18:55 patient waits for the Night clinician
+    assert seen[1] == ("D1", datetime(2025, 1, 1, 18, 50))
+    assert seen[2] == ("N1", datetime(2025, 1, 1, 19))
+    # D1 finishes after their shift has ended and is not given the 19:01 patient
+    assert seen[3][0] == "N1"
+    assert seen[3][1] >= datetime(2025, 1, 1, 19, 15)
+    assert summary["wait_percentiles"][3]["count"] == 3
+
+
+def test_events_at_the_same_time():
+    start, end = epoch(DAY, 7), epoch(DAY, 8)
+    engine = SimulationEngine([("D1", 1, "Day")], [("Day", start, end)], 0, random.Random(0),
+                              duration_range=(25, 25), policy="triage")
+    patients = [
+        (1, 1, start + 10 * 60),
+        (2, 5, start + 10 * 60),  # same arrival, more urgent: every arrival is queued before anyone is seen
+        (3, 3, end),  # arrives as D1 finishes at shift end: the completion comes first, the shift end last
+    ]
+    seen = [(pid, start_epoch) for pid, _, _, start_epoch, *_ in engine.run(patients)]
+    assert seen == [(2, start + 10 * 60), (1, start + 35 * 60), (3, end)]
+    assert engine.unserved == 0